@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2013-2018 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+import argparse
+import platform
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from uci.bench import EngineBenchmark, write_report, format_table
+
+parser = argparse.ArgumentParser(description='benchmark the installed engines (nps, time-to-depth, startup, rss)')
+parser.add_argument('-p', '--engine-path', type=str, default=None, help='engine folder (default engines/<arch>)')
+parser.add_argument('-e', '--engine', type=str, default=None, help='only benchmark engines with this file name part')
+parser.add_argument('-d', '--depth', type=int, default=12, help='search depth for each position')
+parser.add_argument('-t', '--threads', type=str, default='', help="comma separated Threads values like '1,2,4'")
+parser.add_argument('-H', '--hash', type=str, default='', help="comma separated Hash values (MB) like '16,64'")
+parser.add_argument('-o', '--output', type=str, default='bench-' + platform.machine() + '.json',
+                    help='json report file')
+args = parser.parse_args()
+
+results = []
+for threads in [int(x) for x in args.threads.split(',') if x] or [None]:
+    for hash_size in [int(x) for x in args.hash.split(',') if x] or [None]:
+        bench = EngineBenchmark(engine_path=args.engine_path, depth=args.depth, threads=threads, hash_size=hash_size)
+        results.extend(bench.run(args.engine))
+
+write_report(results, args.output)
+print(format_table(results))
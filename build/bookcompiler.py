@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2013-2018 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import heapq
+import io
+import itertools
+import os
+import struct
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import chess
+import chess.pgn
+import chess.polyglot
+
+ENTRY = struct.Struct('>QHHI')  # polyglot entry: key, move, weight, learn
+RUN_ENTRY = struct.Struct('>QHII')  # entry of a sorted run file: key, move, score, games
+GAMES_PER_TASK = 200
+RUN_ENTRIES = 1000000  # max (key, move) pairs kept in memory before a sorted run is written (~100MB)
+MAX_WEIGHT = 0xffff
+MAX_LEARN = 0xffffffff
+PROMOTIONS = {None: 0, chess.KNIGHT: 1, chess.BISHOP: 2, chess.ROOK: 3, chess.QUEEN: 4}
+RESULT_SCORES = {'1-0': (2, 0), '0-1': (0, 2), '1/2-1/2': (1, 1)}  # (white, black) like the classic make-book
+
+
+def polyglot_move(board: chess.Board, move: chess.Move):
+    """Encode the move (castling as king takes rook) for a polyglot entry."""
+    to_square = move.to_square
+    if board.is_castling(move):
+        rook_file = 7 if chess.square_file(move.to_square) > chess.square_file(move.from_square) else 0
+        to_square = chess.square(rook_file, chess.square_rank(move.from_square))
+    return (chess.square_file(to_square) | chess.square_rank(to_square) << 3 |
+            chess.square_file(move.from_square) << 6 | chess.square_rank(move.from_square) << 9 |
+            PROMOTIONS[move.promotion] << 12)
+
+
+def split_games(pgn_files: list, games_per_task: int):
+    """Stream the pgn files as text blocks of games_per_task games."""
+    for pgn_file in pgn_files:
+        with open(pgn_file, 'r', encoding='utf-8-sig', errors='replace') as pgn:
+            block = []
+            games = 0
+            in_moves = False
+            for line in pgn:
+                if line.startswith('[') and in_moves:  # header after the moves => a new game starts
+                    in_moves = False
+                    games += 1
+                    if games == games_per_task:
+                        yield ''.join(block)
+                        block = []
+                        games = 0
+                elif line.strip() and not line.startswith('['):
+                    in_moves = True
+                block.append(line)
+            if block:
+                yield ''.join(block)
+
+
+def score_games(text: str, max_ply: int, min_elo: int):
+    """Worker: return the sorted (key, move, score, games) entries of a block of games."""
+    entries = {}
+    pgn = io.StringIO(text)
+    while True:
+        try:
+            game = chess.pgn.read_game(pgn)
+        except (ValueError, IndexError):
+            continue
+        if game is None:
+            break
+        scores = RESULT_SCORES.get(game.headers.get('Result'))
+        if scores is None or game.errors:
+            continue
+        if min_elo:
+            try:
+                if min(int(game.headers.get('WhiteElo', 0)), int(game.headers.get('BlackElo', 0))) < min_elo:
+                    continue
+            except ValueError:
+                continue
+        board = game.board()
+        for ply, move in enumerate(game.mainline_moves()):
+            if ply >= max_ply:
+                break
+            key = (chess.polyglot.zobrist_hash(board), polyglot_move(board, move))
+            score = scores[0] if board.turn == chess.WHITE else scores[1]
+            value = entries.get(key)
+            if value:
+                value[0] += score
+                value[1] += 1
+            else:
+                entries[key] = [score, 1]
+            board.push(move)
+    return sorted((key, move, score, games) for (key, move), (score, games) in entries.items())
+
+
+def write_run(entries: dict, tmp_dir: str):
+    """Write the entries sorted into a run file and return its name."""
+    handle, name = tempfile.mkstemp(suffix='.run', dir=tmp_dir)
+    with os.fdopen(handle, 'wb') as run:
+        for (key, move), (score, games) in sorted(entries.items()):
+            run.write(RUN_ENTRY.pack(key, move, min(score, MAX_LEARN), min(games, MAX_LEARN)))
+    return name
+
+
+def read_run(name: str):
+    with open(name, 'rb') as run:
+        while True:
+            data = run.read(RUN_ENTRY.size)
+            if len(data) < RUN_ENTRY.size:
+                break
+            yield RUN_ENTRY.unpack(data)
+
+
+def write_position(book, entries: list):
+    """Write the entries of one position: weights scaled into 16 bits and sorted by weight."""
+    top = max(weight for _, _, weight, _ in entries)
+    factor = MAX_WEIGHT / top if top > MAX_WEIGHT else 1
+    scaled = [(key, move, max(1, int(weight * factor)), min(learn, MAX_LEARN)) for key, move, weight, learn in entries]
+    for entry in sorted(scaled, key=lambda entry: (-entry[2], entry[1])):
+        book.write(ENTRY.pack(*entry))
+
+
+def compile_book(pgn_files: list, output: str, max_ply=24, min_games=1, min_score=0, min_elo=0, jobs=None,
+                 run_entries=RUN_ENTRIES):
+    """Compile the pgn files into a polyglot book (learn = number of games)."""
+    jobs = jobs or os.cpu_count() or 1
+    entries = {}
+    runs = []
+    games_blocks = 0
+    with tempfile.TemporaryDirectory() as tmp_dir, ProcessPoolExecutor(max_workers=jobs) as pool:
+        def collect(futures):
+            nonlocal entries
+            for future in futures:
+                for key, move, score, games in future.result():
+                    value = entries.get((key, move))
+                    if value:
+                        value[0] += score
+                        value[1] += games
+                    else:
+                        entries[(key, move)] = [score, games]
+                if len(entries) >= run_entries:
+                    runs.append(write_run(entries, tmp_dir))
+                    entries = {}
+
+        pending = set()
+        for block in split_games(pgn_files, GAMES_PER_TASK):
+            if len(pending) >= 2 * jobs:  # bounded memory => dont read ahead the whole pgn
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(pool.submit(score_games, block, max_ply, min_elo))
+            games_blocks += 1
+        collect(pending)
+        if entries:
+            runs.append(write_run(entries, tmp_dir))
+            entries = {}
+
+        positions = 0
+        written = 0
+        with open(output, 'wb') as book:
+            merged = heapq.merge(*[read_run(run) for run in runs])
+            for key, group in itertools.groupby(merged, key=lambda entry: entry[0]):
+                position = []
+                for (_, move), same in itertools.groupby(group, key=lambda entry: entry[:2]):
+                    score = games = 0
+                    for _, _, run_score, run_games in same:
+                        score += run_score
+                        games += run_games
+                    if games >= min_games and score >= min_score and score > 0:
+                        position.append((key, move, score, games))
+                if position:
+                    write_position(book, position)
+                    positions += 1
+                    written += len(position)
+    print('{} game blocks, {} runs, {} positions, {} entries => {}'.format(games_blocks, len(runs), positions,
+                                                                          written, output))
+
+
+def read_book(name: str, factor: float, index: int):
+    """Stream the (sorted) entries of a polyglot book with its weight factor and priority."""
+    with open(name, 'rb') as book:
+        while True:
+            data = book.read(ENTRY.size)
+            if len(data) < ENTRY.size:
+                break
+            key, move, weight, learn = ENTRY.unpack(data)
+            yield key, index, move, weight * factor, learn
+
+
+def merge_books(books: list, output: str, rule='sum'):
+    """Merge polyglot books given as (file, factor) - rule: sum, max or first (the first book with the position)."""
+    positions = 0
+    with open(output, 'wb') as out:
+        merged = heapq.merge(*[read_book(name, factor, index) for index, (name, factor) in enumerate(books)])
+        for key, group in itertools.groupby(merged, key=lambda entry: entry[0]):
+            group = list(group)
+            if rule == 'first':
+                first = min(entry[1] for entry in group)
+                group = [entry for entry in group if entry[1] == first]
+            moves = {}
+            for _, _, move, weight, learn in group:
+                old_weight, old_learn = moves.get(move, (0, 0))
+                if rule == 'max':
+                    moves[move] = (max(old_weight, weight), max(old_learn, learn))
+                else:
+                    moves[move] = (old_weight + weight, old_learn + learn)
+            position = [(key, move, int(weight), learn) for move, (weight, learn) in moves.items() if int(weight) > 0]
+            if position:
+                write_position(out, position)
+                positions += 1
+    print('{} books, {} positions => {}'.format(len(books), positions, output))
+
+
+def book_with_factor(text: str):
+    name, _, factor = text.partition(':')
+    return name, float(factor) if factor else 1.0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='compile pgn files into a polyglot book or merge polyglot books')
+    commands = parser.add_subparsers(dest='command')
+    compile_parser = commands.add_parser('compile', help='pgn files => polyglot book')
+    compile_parser.add_argument('output', type=str, help='polyglot book to write')
+    compile_parser.add_argument('pgn', type=str, nargs='+', help='pgn files')
+    compile_parser.add_argument('-p', '--ply', type=int, default=24, help='max ply of a game taken into the book')
+    compile_parser.add_argument('-g', '--min-games', type=int, default=1, help='min games a move was played')
+    compile_parser.add_argument('-s', '--min-score', type=int, default=0, help='min score (win 2, draw 1) of a move')
+    compile_parser.add_argument('-e', '--min-elo', type=int, default=0, help='min elo of both players')
+    compile_parser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default all cores)')
+    compile_parser.add_argument('-m', '--memory', type=int, default=RUN_ENTRIES,
+                                help='max entries kept in memory before sorting them out to a temp file')
+    merge_parser = commands.add_parser('merge', help='polyglot books => polyglot book')
+    merge_parser.add_argument('output', type=str, help='polyglot book to write')
+    merge_parser.add_argument('books', type=book_with_factor, nargs='+', help='books as file[:weight factor]')
+    merge_parser.add_argument('-r', '--rule', choices=['sum', 'max', 'first'], default='sum',
+                              help='sum or max of the weights, or take a position from the first book having it')
+    args = parser.parse_args()
+
+    if args.command == 'compile':
+        compile_book(args.pgn, args.output, max_ply=args.ply, min_games=args.min_games, min_score=args.min_score,
+                     min_elo=args.min_elo, jobs=args.jobs, run_entries=args.memory)
+    elif args.command == 'merge':
+        merge_books(args.books, args.output, rule=args.rule)
+    else:
+        parser.print_help()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2013-2018 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+import argparse
+import subprocess
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import chess
+import chess.uci
+from uci.infoparser import FastInfoEngine, FastInfoHandler
+
+# a middlegame position with many legal moves (like the tutor sees them)
+BENCH_FEN = 'r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP2BPPP/R2QKB1R w KQ - 0 9'
+
+
+def record(engine_path: str, filename: str, multipv: int, movetime: int):
+    """Record the info output of a MultiPV search."""
+    process = subprocess.Popen([engine_path], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               universal_newlines=True, cwd=os.path.dirname(os.path.abspath(engine_path)))
+    commands = ['uci', 'setoption name MultiPV value {}'.format(multipv), 'isready',
+                'position fen ' + BENCH_FEN, 'go movetime {}'.format(movetime)]
+    process.stdin.write('\n'.join(commands) + '\n')
+    process.stdin.flush()
+    with open(filename, 'w') as file:
+        file.write(BENCH_FEN + '\n')
+        for line in process.stdout:
+            if line.startswith('info '):
+                file.write(line)
+            elif line.startswith('bestmove'):
+                break
+    process.stdin.write('quit\n')
+    process.stdin.flush()
+    process.wait()
+
+
+def replay(engine: chess.uci.Engine, handler: chess.uci.InfoHandler, board: chess.Board, lines: list):
+    """Feed the info lines like the engine reader thread and read the first moves like the tutor does."""
+    engine.board = board
+    engine.info_handlers.append(handler)
+    handler.on_go()
+    first_moves = {}
+    start = time.perf_counter()
+    for line in lines:
+        engine._info(line)
+    with handler:
+        for key, pv_list in handler.info['pv'].items():
+            first_moves[key] = (pv_list[0], handler.info['score'].get(key))
+    return time.perf_counter() - start, first_moves
+
+
+parser = argparse.ArgumentParser(description='benchmark the uci info parsing on recorded MultiPV output')
+parser.add_argument('-f', '--file', type=str, default='multipv.log', help='recorded info lines (recorded if missing)')
+parser.add_argument('-e', '--engine', type=str, help='engine used for recording')
+parser.add_argument('-m', '--multipv', type=int, default=200, help='MultiPV for recording')
+parser.add_argument('-t', '--movetime', type=int, default=3000, help='search time (ms) for recording')
+parser.add_argument('-r', '--rounds', type=int, default=5, help='number of replays')
+args = parser.parse_args()
+
+if not os.path.isfile(args.file):
+    if not args.engine:
+        parser.error('recording {} not found - please give an engine for recording'.format(args.file))
+    print('recording {} with {} ...'.format(args.file, args.engine))
+    record(args.engine, args.file, args.multipv, args.movetime)
+
+with open(args.file, 'r') as recording:
+    fen = recording.readline().strip()
+    info_lines = [line.rstrip('\n').split(' ', 1)[1] for line in recording if line.startswith('info ')]
+bench_board = chess.Board(fen)
+print('{} info lines, {} legal moves'.format(len(info_lines), bench_board.legal_moves.count()))
+
+results = {}
+for name, engine_cls, handler_cls in (('chess.uci', chess.uci.Engine, chess.uci.InfoHandler),
+                                      ('infoparser', FastInfoEngine, FastInfoHandler)):
+    timings = []
+    for _ in range(args.rounds):
+        secs, moves = replay(engine_cls(), handler_cls(), bench_board, info_lines)
+        timings.append(secs)
+    results[name] = (min(timings), moves)
+    print('{:<12} {:8.1f}ms {:10.0f} lines/s'.format(name, min(timings) * 1000, len(info_lines) / min(timings)))
+
+print('speedup: {:.1f}x'.format(results['chess.uci'][0] / results['infoparser'][0]))
+print('same results: {}'.format(results['chess.uci'][1] == results['infoparser'][1]))
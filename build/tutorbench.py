@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2013-2018 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+import argparse
+import random
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import chess
+import chess.uci
+from uci.infoparser import FastInfoEngine, FastInfoHandler
+from picotutor import PicoTutor
+import picotutor_constants as c
+
+BENCH_FENS = [
+    'r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3',
+    'rnbqkb1r/pp2pppp/3p1n2/8/3NP3/8/PPP2PPP/RNBQKB1R w KQkq - 1 5',
+    'r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP2BPPP/R2QKB1R w KQ - 0 9',
+    'r2q1rk1/pb1nbppp/1p2pn2/2pp4/2PP4/1PN1PN2/PB2BPPP/R2Q1RK1 w - - 0 10',
+    'r1b2rk1/2q1bppp/p2ppn2/1p4B1/3NPP2/2N2Q2/PPP3PP/2KR1B1R w - - 0 12',
+    '2r2rk1/pp1bqppp/2n1pn2/3p4/3P4/P1NBPN2/1P3PPP/R2Q1RK1 w - - 0 14',
+    'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+    '8/5pk1/6p1/3P4/1p2K3/6P1/5P2/8 w - - 0 45',
+    'r3r1k1/pp3ppp/2p5/4Pb2/2B5/2N2P2/PP4PP/R4RK1 b - - 0 18',
+    '3r2k1/p4ppp/1p2p3/2r5/2P5/P3P3/5PPP/R3K2R w KQ - 0 22',
+]
+
+
+def verdict(best_score: float, move_score: float):
+    """The mistake part of PicoTutor.get_user_move_eval ('?!' and the good marks need the low depth & history)."""
+    diff = best_score - move_score
+    if diff > c.VERY_BAD_MOVE_TH:
+        return '??'
+    if diff > c.BAD_MOVE_TH:
+        return '?'
+    return ''
+
+
+def mistake(eval_string: str):
+    """Return the mistake part of a tutor verdict."""
+    return eval_string if eval_string in ('??', '?') else ''
+
+
+def tutor_verdict(tutor: PicoTutor, board: chess.Board, move: chess.Move, movetime: int):
+    """Return the verdict of PicoTutor.get_user_move_eval, the searched score and the secs it waited."""
+    tutor.set_position(board.fen(), i_turn=board.turn)
+    tutor.set_user_color(board.turn)  ## starts the analysis of the user's turn
+    time.sleep(movetime / 1000)
+    tutor.push_move(move)
+    start = time.perf_counter()
+    eval_string = tutor.get_user_move_eval()[0]
+    secs = time.perf_counter() - start
+    score = tutor.history[-1][2]
+    tutor.pause()
+    return eval_string, score, secs
+
+
+def pawns(score):
+    if score is None:
+        return None
+    if score.mate is not None:
+        return 999 if score.mate > 0 else -999
+    return score.cp / 100
+
+
+def search(engine: chess.uci.Engine, board: chess.Board, movetime: int, multipv: int):
+    """Return {move: score}, depth and secs of a MultiPV search."""
+    handler = FastInfoHandler()
+    engine.info_handlers[:] = [handler]
+    engine.setoption({'MultiPV': multipv})
+    engine.position(board)
+    engine.isready()
+    start = time.perf_counter()
+    engine.go(movetime=movetime)
+    secs = time.perf_counter() - start
+    scores = {}
+    with handler:
+        for key, pv in handler.info['pv'].items():
+            if pv and handler.info['score'].get(key):
+                scores[pv[0]] = pawns(handler.info['score'][key])
+        depth = handler.info.get('depth')
+    return scores, depth, secs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='compare the tutor verdicts with the ones of a full width search')
+    parser.add_argument('engine', type=str, help='tutor engine (stockfish)')
+    parser.add_argument('-t', '--movetime', type=int, default=2000, help='analysis time (ms) before the user move')
+    parser.add_argument('-m', '--moves', type=int, default=4, help='random user moves per position')
+    parser.add_argument('-s', '--single', action='store_true', help='tutor in single engine mode')
+    args = parser.parse_args()
+
+    random.seed(1)
+    tutor = PicoTutor(i_engine_path=args.engine, i_single_engine=args.single)
+    tutor.set_status(watcher=True)
+    engine = chess.uci.popen_engine(args.engine, engine_cls=FastInfoEngine)
+    engine.uci()
+    engine.setoption({'Threads': c.NUM_THREADS, 'Contempt': 0})
+    agree = total = waits = 0
+    wait_secs = 0.0
+    depths = []
+    for fen in BENCH_FENS:
+        board = chess.Board(fen)
+        moves = list(board.legal_moves)
+        for move in random.sample(moves, min(args.moves, len(moves))):
+            eval_string, score, secs = tutor_verdict(tutor, board, move, args.movetime)
+            if secs > 0.01:
+                waits += 1
+                wait_secs += secs
+            ## the full width search gets the same total time as the tutor (analysis and waiting for the verdict)
+            engine.ucinewgame()
+            full, depth, _ = search(engine, board, args.movetime + int(1000 * secs), 200)
+            depths.append(depth)
+            if move not in full:
+                continue
+            full_verdict = verdict(max(full.values()), full[move])
+            total += 1
+            agree += full_verdict == mistake(eval_string)
+            print('{:<6} full {:>6.2f} {:<2}  tutor {:>6.2f} {:<2}'.format(board.san(move), full[move], full_verdict,
+                                                                       score, eval_string))
+    tutor.stop()
+    engine.quit()
+
+    print('avg depth full width: {:.1f}'.format(sum(depths) / len(depths)))
+    print('mistake verdict agreement (??, ?): {}/{} ({:.0f}%)'.format(agree, total, 100 * agree / total if total else 0))
+    print('verdicts waiting for a searched score: {} ({:.0f}ms avg)'.format(waits, 1000 * wait_secs / waits if waits else 0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2013-2018 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import os
+import argparse
+import logging
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from uci.remote import UciTcpServer, TCP_PORT, TCP_HOST
+
+parser = argparse.ArgumentParser(description='serve the engines of a folder with the native uci over tcp protocol')
+parser.add_argument('engine_home', type=str, help='engine folder (only engines & files inside are served)')
+parser.add_argument('-b', '--bind', type=str, default=TCP_HOST,
+                    help='address to listen on (default only local, any other one needs --key)')
+parser.add_argument('-p', '--port', type=int, default=TCP_PORT, help='tcp port')
+parser.add_argument('-k', '--key', type=str, default=os.environ.get('UCISERVER_KEY', ''),
+                    help='shared key the clients must know (default env UCISERVER_KEY)')
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+try:
+    server = UciTcpServer(args.engine_home, host=args.bind, port=args.port, key=args.key)
+except ValueError as val_exc:
+    parser.error(str(val_exc))
+print('serving engines from {} on port {}'.format(server.engine_home, args.port))
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    server.server_close()
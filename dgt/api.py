@@ -57,6 +57,7 @@ class EventApi():
     REMOTE_MOVE = 'EVT_REMOTE_MOVE'  # Remote player move
     SET_OPENING_BOOK = 'EVT_SET_OPENING_BOOK'  # User chooses an opening book
     NEW_ENGINE = 'EVT_NEW_ENGINE'  # Change engine
+    PRELAUNCH_ENGINE = 'EVT_PRELAUNCH_ENGINE'  # User browses to an engine (slow ones get started in background)
     SET_INTERACTION_MODE = 'EVT_SET_INTERACTION_MODE'  # Change interaction mode
     SETUP_POSITION = 'EVT_SETUP_POSITION'  # Setup custom position
     PAUSE_RESUME = 'EVT_PAUSE_RESUME'  # Stops search or halt/resume running clock
@@ -315,6 +316,7 @@ class Event():
     REMOTE_MOVE = ClassFactory(EventApi.REMOTE_MOVE, ['move', 'fen'])
     SET_OPENING_BOOK = ClassFactory(EventApi.SET_OPENING_BOOK, ['book', 'book_text', 'show_ok'])
     NEW_ENGINE = ClassFactory(EventApi.NEW_ENGINE, ['eng', 'eng_text', 'options', 'show_ok'])
+    PRELAUNCH_ENGINE = ClassFactory(EventApi.PRELAUNCH_ENGINE, ['eng'])
     SET_INTERACTION_MODE = ClassFactory(EventApi.SET_INTERACTION_MODE, ['mode', 'mode_text', 'show_ok'])
     SETUP_POSITION = ClassFactory(EventApi.SETUP_POSITION, ['fen', 'uci960'])
     PAUSE_RESUME = ClassFactory(EventApi.PAUSE_RESUME, [])
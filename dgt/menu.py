@@ -2412,6 +2412,7 @@ class DgtMenu(object):
 
         elif self.state == MenuState.ENG_NAME:
             self.menu_engine_name = (self.menu_engine_name - 1) % len(self.installed_engines)
+            Observable.fire(Event.PRELAUNCH_ENGINE(eng=self.installed_engines[self.menu_engine_name]))
             text = self._get_current_engine_name()
 
         elif self.state == MenuState.ENG_NAME_LEVEL:
@@ -2427,6 +2428,7 @@ class DgtMenu(object):
 
         elif self.state == MenuState.ENG_NAME2:
             self.menu_engine_name2 = (self.menu_engine_name2 - 1) % len(self.installed_engines2)
+            Observable.fire(Event.PRELAUNCH_ENGINE(eng=self.installed_engines2[self.menu_engine_name2]))
             text = self._get_current_engine_name2()
 
         elif self.state == MenuState.ENG_NAME_LEVEL2:
@@ -2842,6 +2844,7 @@ class DgtMenu(object):
 
         elif self.state == MenuState.ENG_NAME:
             self.menu_engine_name = (self.menu_engine_name + 1) % len(self.installed_engines)
+            Observable.fire(Event.PRELAUNCH_ENGINE(eng=self.installed_engines[self.menu_engine_name]))
             text = self._get_current_engine_name()
 
         elif self.state == MenuState.ENG_NAME_LEVEL:
@@ -2857,6 +2860,7 @@ class DgtMenu(object):
 
         elif self.state == MenuState.ENG_NAME2:
             self.menu_engine_name2 = (self.menu_engine_name2 + 1) % len(self.installed_engines2)
+            Observable.fire(Event.PRELAUNCH_ENGINE(eng=self.installed_engines2[self.menu_engine_name2]))
             text = self._get_current_engine_name2()
 
         elif self.state == MenuState.ENG_NAME_LEVEL2:
@@ -18,9 +18,13 @@
 import threading
 import base64
 import datetime
+import io
 import logging
+import multiprocessing
 import os
 import queue
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
 from email import encoders
 from email.mime.multipart import MIMEMultipart
 from email.mime.audio import MIMEAudio
@@ -32,6 +36,7 @@ import requests
 
 import chess
 import chess.pgn
+import chess.uci
 from timecontrol import TimeControl
 from utilities import DisplayMsg
 from dgt.api import Message
@@ -245,15 +250,204 @@ class Emailer(object):
                 self._use_smtp(subject=subject, body=body, path=path)
 
 
+ANNOTATE_BLUNDER = 2.5  # pawns lost by a move for ?? (like the tutor thresholds)
+ANNOTATE_MISTAKE = 1.5
+ANNOTATE_INACCURACY = 0.3
+ANNOTATE_MATE_SCORE = 20  # pawns used for a mate score when calculating the loss of a move
+
+_annotate_engine = None  # the engine of an annotator worker process
+
+
+def _annotate_init(engine_path: str):
+    """Start the engine of an annotator worker process (one thread, small hash)."""
+    global _annotate_engine
+    logging.debug('annotator worker %s starts engine [%s]', os.getpid(), engine_path)
+    _annotate_engine = chess.uci.popen_engine(engine_path)
+    _annotate_engine.uci()
+    options = {}
+    if 'Threads' in _annotate_engine.options:
+        options['Threads'] = 1
+    if 'Hash' in _annotate_engine.options:
+        options['Hash'] = 32
+    _annotate_engine.setoption(options)
+    _annotate_engine.isready()
+
+
+def _annotate_position(engine_path: str, fen: str, secs: float):
+    """Worker: return (cp, mate, bestmove uci) of the position - score from the side to move."""
+    if _annotate_engine is None:
+        _annotate_init(engine_path)
+    handler = chess.uci.InfoHandler()
+    _annotate_engine.info_handlers[:] = [handler]
+    _annotate_engine.ucinewgame()
+    _annotate_engine.position(chess.Board(fen))
+    best = _annotate_engine.go(movetime=int(secs * 1000))
+    with handler:
+        score = handler.info['score'].get(1)
+    if score is None:
+        return None, None, best.bestmove.uci() if best.bestmove else None
+    return score.cp, score.mate, best.bestmove.uci() if best.bestmove else None
+
+
+def _annotate_context():
+    """Workers forked by a clean server process - not from picochess with its threads & open files."""
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['pgn'])  # the workers only need this module (not the picochess main one)
+    return context
+
+
+class PgnAnnotator(threading.Thread):
+
+    """Annotate finished games on idle cores and write them to [games/name]_annotated.pgn.
+
+    The analysis of the positions is done in worker processes. While a game is played it is paused
+    and the workers (with their engines) are stopped.
+    """
+
+    def __init__(self, engine_path: str, secs_per_ply: float, file_name: str, workers=None):
+        super(PgnAnnotator, self).__init__()
+        self.daemon = True
+        self.engine_path = engine_path
+        self.secs_per_ply = secs_per_ply
+        self.file_name = os.path.splitext(file_name)[0] + '_annotated.pgn'
+        self.workers = workers or max(1, (os.cpu_count() or 1) - 1)  # one core left for picochess
+        self.games = queue.Queue()
+        self.pool = None  # only used by the annotator thread
+        self.idle = threading.Event()  # set while no game is played
+        self.idle.set()
+
+    def add(self, pgn_text: str):
+        """Queue a (saved) game for annotation."""
+        self.games.put(pgn_text)
+
+    def pause(self):
+        """A game is played => no new positions are given to the workers, they stop after the running ones."""
+        self.idle.clear()
+
+    def resume(self):
+        self.idle.set()
+
+    def run(self):
+        logging.info('pgn annotator ready')
+        while True:
+            pgn_text = self.games.get()
+            try:
+                while pgn_text:
+                    game = chess.pgn.read_game(io.StringIO(pgn_text))
+                    if game is not None:
+                        self._annotate(game)
+                        self._write(game)
+                    pgn_text = None if self.games.empty() else self.games.get()
+            except (OSError, BrokenProcessPool, chess.uci.EngineTerminatedException):
+                logging.exception('pgn annotator failed')
+            finally:
+                self._shutdown()  # engines only live while annotating
+
+    def _pool(self):
+        """Return the worker pool - started (again) when needed."""
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_annotate_context())
+        return self.pool
+
+    def _shutdown(self):
+        """Stop the workers and their engines."""
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+            self.pool = None
+
+    def _analyse(self, boards: list):
+        """Return the (cp, mate, bestmove) of the boards - only submits positions while idle."""
+        results = [None] * len(boards)
+        pending = {}
+        index = 0
+        while index < len(boards) or pending:
+            if not self.idle.is_set() and not pending:
+                logging.debug('annotator paused - workers stopped')
+                self._shutdown()
+                self.idle.wait()
+            while index < len(boards) and len(pending) < self.workers and self.idle.is_set():
+                board = boards[index]
+                if board.is_checkmate():
+                    results[index] = (None, 0, None)
+                elif board.is_game_over():
+                    results[index] = (0, None, None)
+                else:
+                    pending[self._pool().submit(_annotate_position, self.engine_path, board.fen(), self.secs_per_ply)] = index
+                index += 1
+            if pending:
+                done, _ = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+        return results
+
+    @staticmethod
+    def _pawns(cp, mate):
+        """Score in pawns (mates are big numbers) or None."""
+        if mate is not None:
+            return ANNOTATE_MATE_SCORE if mate > 0 else -ANNOTATE_MATE_SCORE
+        return cp / 100 if cp is not None else None
+
+    def _annotate(self, game: chess.pgn.Game):
+        """Add eval comments and nags (?!, ?, ??) to the moves of the game."""
+        board = game.board()
+        boards = [board.copy()]
+        nodes = []
+        node = game
+        while node.variations:
+            node = node.variation(0)
+            nodes.append(node)
+            board.push(node.move)
+            boards.append(board.copy())
+        logging.debug('annotate game of %s plies', len(nodes))
+        results = self._analyse(boards)
+        for ply, node in enumerate(nodes):
+            before, after = results[ply], results[ply + 1]
+            if before is None or after is None:
+                continue
+            best_score = self._pawns(before[0], before[1])
+            move_score = self._pawns(after[0], after[1])  # from the side of the opponent
+            if after[1] == 0:  # mate on the board
+                continue
+            if after[1] is not None:
+                comment = '[%eval #{}]'.format(-after[1] if boards[ply].turn == chess.WHITE else after[1])
+            elif after[0] is not None:
+                white_cp = -after[0] if boards[ply].turn == chess.WHITE else after[0]
+                comment = '[%eval {:.2f}]'.format(white_cp / 100)
+            else:
+                continue
+            if best_score is not None and move_score is not None:
+                loss = best_score + move_score
+                nag = None
+                if loss > ANNOTATE_BLUNDER:
+                    nag, text = chess.pgn.NAG_BLUNDER, 'Blunder'
+                elif loss > ANNOTATE_MISTAKE:
+                    nag, text = chess.pgn.NAG_MISTAKE, 'Mistake'
+                elif loss > ANNOTATE_INACCURACY:
+                    nag, text = chess.pgn.NAG_DUBIOUS_MOVE, 'Inaccuracy'
+                if nag and before[2] and before[2] != node.move.uci():
+                    node.nags.add(nag)
+                    best_move = chess.Move.from_uci(before[2])
+                    comment += ' {}. {} was best.'.format(text, boards[ply].san(best_move))
+            node.comment = (node.comment + ' ' + comment).strip() if node.comment else comment
+        game.headers['Annotator'] = 'PicoChess ({}s/ply)'.format(self.secs_per_ply)
+
+    def _write(self, game: chess.pgn.Game):
+        logging.debug('Saving annotated game to [%s]', self.file_name)
+        with open(self.file_name, 'a') as file:
+            exporter = chess.pgn.FileExporter(file)
+            game.accept(exporter)
+
+
 class PgnDisplay(DisplayMsg, threading.Thread):
 
     """Deal with DisplayMessages related to pgn."""
 
-    def __init__(self, file_name: str, emailer: Emailer):
+    def __init__(self, file_name: str, emailer: Emailer, annotator: PgnAnnotator = None):
         super(PgnDisplay, self).__init__()
         self.file_name = file_name
         self.last_file_name = 'games' + os.sep + 'last_game.pgn'
         self.emailer = emailer
+        self.annotator = annotator
 
         self.engine_name = '?'
         self.old_engine = '?'
@@ -404,6 +598,8 @@ class PgnDisplay(DisplayMsg, threading.Thread):
         file.close()
         
         self.emailer.send('Game PGN', str(pgn_game), self.file_name)
+        if self.annotator:
+            self.annotator.add(str(pgn_game))
 
                 
     def _save_pgn(self, message):   ## molli
@@ -585,9 +781,13 @@ class PgnDisplay(DisplayMsg, threading.Thread):
         elif isinstance(message, Message.GAME_ENDS):
             if message.game.move_stack and not ModeInfo.get_pgn_mode() and self.mode != Mode.PONDER:
                 self._save_and_email_pgn(message)
+            if self.annotator:
+                self.annotator.resume()
 
         elif isinstance(message, Message.START_NEW_GAME):
             self.startime = datetime.datetime.now().strftime('%H:%M:%S')
+            if self.annotator:
+                self.annotator.pause()
         
         elif isinstance(message, Message.SAVE_GAME):
             logging.debug('molli: save game message pgn dispatch')
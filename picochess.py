@@ -266,26 +266,29 @@ import threading
 import copy
 import gc
 import logging
+import signal
 from logging.handlers import RotatingFileHandler
 import time
 import queue
 import configargparse
 from platform import machine
-import paramiko
 import copy
 import math
 
 from uci.engine import UciShell, UciEngine
 from uci.read import read_engine_ini
+from uci.remote import remote_pool
+from uci.prelaunch import prelauncher, is_emulation_engine, is_emulation_name
 import chess
 import chess.pgn
 import chess.polyglot
 import chess.uci
 
-from timecontrol import TimeControl
-from utilities import get_location, update_picochess, get_opening_books, shutdown, reboot, checkout_tag
+from timecontrol import TimeControl, MoveOverhead
+from utilities import get_location, update_picochess, get_opening_books, shutdown, reboot, checkout_tag, book_store
 from utilities import Observable, DisplayMsg, version, evt_queue, write_picochess_ini, hms_time, RepeatedTimer
-from pgn import Emailer, PgnDisplay, ModeInfo
+from utilities import log_sink, LogSink
+from pgn import Emailer, PgnDisplay, PgnAnnotator, ModeInfo
 from server import WebServer
 from talker.picotalker import PicoTalkerDisplay
 from dispatcher import Dispatcher
@@ -319,13 +322,20 @@ class AlternativeMover:
 
     def book(self, bookreader, game_copy: chess.Board):
         """Get a BookMove or None from game position."""
+        book_res = self.book_lookup(bookreader, game_copy, self.excludemoves)
+        if book_res:
+            self.add(book_res.bestmove)
+        return book_res
+
+    @staticmethod
+    def book_lookup(bookreader, game_copy: chess.Board, excludemoves=()):
+        """Get a BookMove or None from game position without changing the excluded moves."""
         try:
-            choice = bookreader.weighted_choice(game_copy, self.excludemoves)
+            choice = bookreader.weighted_choice(game_copy, excludemoves)
         except IndexError:
             return None
 
         book_move = choice.move()
-        self.add(book_move)
         game_copy.push(book_move)
         try:
             choice = bookreader.weighted_choice(game_copy)
@@ -357,6 +367,56 @@ class AlternativeMover:
         """Reset the exclude move list."""
         self.excludemoves = set()
 
+
+class BookPrefetcher(object):
+
+    """Look up the book replies for all legal user moves in the background (during the user's time)."""
+
+    MISSING = object()
+
+    def __init__(self):
+        self.replies = {}  # fen after the user move => BestMove or None
+        self.bookreader = None
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def start(self, bookreader, game: chess.Board):
+        """Start the look up for the position with the user to move."""
+        with self.lock:
+            self.generation += 1
+            self.replies = {}
+            self.bookreader = bookreader
+            generation = self.generation
+        thread = threading.Thread(target=self._prefetch, args=(bookreader, game.copy(), generation),
+                                  name='book prefetch')
+        thread.daemon = True
+        thread.start()
+
+    def _prefetch(self, bookreader, game: chess.Board, generation: int):
+        for move in list(game.legal_moves):
+            game.push(move)
+            book_res = AlternativeMover.book_lookup(bookreader, game.copy())
+            fen = game.fen()
+            game.pop()
+            with self.lock:
+                if generation != self.generation:
+                    return
+                self.replies[fen] = book_res
+
+    def get(self, bookreader, game: chess.Board):
+        """Return the prefetched book reply (a BestMove or None) or MISSING if not (yet) known."""
+        with self.lock:
+            if bookreader is not self.bookreader:
+                return self.MISSING
+            return self.replies.pop(game.fen(), self.MISSING)
+
+    def cancel(self):
+        """Forget all prefetched replies."""
+        with self.lock:
+            self.generation += 1
+            self.replies = {}
+            self.bookreader = None
+
 flag_startup = False
 online_prefix = 'Online'
 seeking_flag = False
@@ -395,17 +455,17 @@ def main():
     global position_mode
     global start_time_cmove_done
     
-    def check_ssh(host, username, password):
-        l_ssh = True
-        try:
-            s = paramiko.SSHClient()
-            s.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            s.connect(host, username=username, password=password, timeout=7)
-            s.close()
-        except:
-            l_ssh = False
-        
-        return(l_ssh)
+    def get_remote_shell():
+        """Get the pooled (kept alive) connection to the remote engine server or None."""
+        if args.engine_remote_tcp:
+            return remote_pool.get_tcp(args.engine_remote_server, args.engine_remote_tcp, args.engine_remote_tcp_key)
+        if remote_windows(): ## molli for Windows use specific shell type
+            logging.info('molli: Remote Windows Connection')
+        else:
+            logging.info('molli: Remote Mac/UNIX Connection')
+        return remote_pool.get(hostname=args.engine_remote_server, username=args.engine_remote_user,
+                               key_file=args.engine_remote_key, password=args.engine_remote_pass,
+                               windows=remote_windows())
 
     ####################################################
     # molli: PGN GAME MODE
@@ -721,10 +781,7 @@ def main():
             return(False)
 
     def emulation_mode():
-        emulation = False
-        if '(mame' in engine_name or '(mess' in engine_name:
-            emulation = True ## molli emulation mode
-        return(emulation)
+        return is_emulation_name(engine_name) ## molli emulation mode
     
     def online_mode():
         online = False
@@ -1299,6 +1356,23 @@ def main():
             game_copy.pop()
         return fens
 
+    def board_type():
+        """Return the kind of board the user executes the computer moves on."""
+        if args.enable_console:
+            return 'console'
+        if dgtboard.is_revelation:
+            return 'revelation'
+        return 'dgtpi' if args.dgtpi else 'dgt'
+
+    def engine_uci_time(timec: TimeControl):
+        """Return the uci time dict considering the measured move overhead (engine option or shortened times)."""
+        if timec.mode == TimeMode.FIXED or emulation_mode() or online_mode() or pgn_mode():
+            return timec.uci()
+        overhead = move_overhead.get(engine_name, board_type())
+        if not overhead or engine.set_move_overhead(overhead):
+            return timec.uci()
+        return timec.uci(overhead=overhead)
+
     def think(game: chess.Board, timec: TimeControl, msg: Message, searchlist=False):
         nonlocal automatic_takeback
         """
@@ -1309,14 +1383,18 @@ def main():
         DisplayMsg.show(msg)
         if not online_mode() or game.fullmove_number > 1:
             start_clock()
-        book_res = searchmoves.book(bookreader, game.copy())
+        book_res = book_prefetcher.get(bookreader, game) if not searchmoves.excludemoves else BookPrefetcher.MISSING
+        if book_res is BookPrefetcher.MISSING:
+            book_res = searchmoves.book(bookreader, game.copy())
+        elif book_res:
+            searchmoves.add(book_res.bestmove)
         if (book_res and not emulation_mode() and not online_mode() and not pgn_mode()) or (book_res and (pgn_mode() and pgn_book_test)):
             Observable.fire(Event.BEST_MOVE(move=book_res.bestmove, ponder=book_res.ponder, inbook=True))
         else:
             while not engine.is_waiting():
                 time.sleep(0.05)
                 logging.warning('engine is still not waiting')
-            uci_dict = timec.uci()
+            uci_dict = engine_uci_time(timec)
             if searchlist:
                 uci_dict['searchmoves'] = searchmoves.all(game) ##molli: otherwise might lead to problems with internal books
             engine.position(copy.deepcopy(game))
@@ -1356,7 +1434,8 @@ def main():
             game_copy.push(pb_move)
             logging.info('start permanent brain with pondering move [%s] fen: %s', pb_move, game_copy.fen())
             engine.position(game_copy)
-            engine.brain(timec.uci())
+            tc_text = '{} {}'.format(timec.mode.name.lower(), ' '.join(timec.get_list_text().split()))
+            engine.brain(engine_uci_time(timec), tc_text)
         else:
             logging.info('ignore permanent brain cause no pondering move available')
 
@@ -1472,6 +1551,10 @@ def main():
             if interaction_mode == Mode.BRAIN:
                 ponder_hit = (move == pb_move)
                 logging.info('pondering move: [%s] res: Ponder%s', pb_move, 'Hit' if ponder_hit else 'Miss')
+                engine.ponder_result(ponder_hit)
+                if ponder_hit and not engine.is_pondering():  # adaptive ponder didnt start or stopped the search
+                    logging.info('engine not pondering anymore, turn ponderhit off')
+                    ponder_hit = False
             else:
                 ponder_hit = False
             if sliding and ponder_hit:
@@ -2410,6 +2493,10 @@ def main():
     parser.add_argument('-erk', '--engine-remote-key', type=str, help='key file for the remote engine server')
     parser.add_argument('-erh', '--engine-remote-home', type=str, help='engine home path for the remote engine server',
                         default='')
+    parser.add_argument('-ert', '--engine-remote-tcp', type=int, default=None, metavar='PORT',
+                        help='use the native uci over tcp server on this port instead of ssh for remote engines')
+    parser.add_argument('-ertk', '--engine-remote-tcp-key', type=str, default='',
+                        help='shared key of the uci over tcp server (needed if it listens on the network)')
     parser.add_argument('-d', '--dgt-port', type=str,
                         help="enable dgt board on the given serial port such as '/dev/ttyUSB0'")
     parser.add_argument('-b', '--book', type=str, help="path of book such as 'books/b-flank.bin'",
@@ -2475,6 +2562,9 @@ def main():
     parser.add_argument('-watc', '--tutor-watcher', action='store_true', help='Pico Watcher: atomatic move evaluation, blunder warning & move suggestion, default is off')
     parser.add_argument('-coch', '--tutor-coach', action='store_true', help='Pico Coach: move and position evaluation, move suggestion etc. on demand, default is off')
     parser.add_argument('-open', '--tutor-explorer', action='store_true', help='Pico Opening Explorrer: shows the name(s) of the opening (based on ECO file), default is off')
+    parser.add_argument('-tsin', '--tutor-single-engine', action='store_true', help='PicoTutor uses one engine for the low and deep depth analysis (saves one engine process and its hash memory), default is off')
+    parser.add_argument('-tlog', '--tutor-log', choices=['off', 'normal', 'verbose'], default='off', help='PicoTutor log (picotutor-log.txt) written in the background, verbose also logs the move lists of each move (switch the level at runtime with kill -USR1), default is off')
+    parser.add_argument('-anno', '--annotate-secs', type=float, default=0, help='analyse each ply of a finished game for secs with the tutor engine (on the idle cores) and save the annotated game, default is 0 (off)')
     parser.add_argument('-tcom', '--tutor-comment', type=str, default='off', help='show game comments based on specific engines (=single) or in general (=all). Default value is off')
     parser.add_argument('-loc', '--location', type=str, default='auto', help='determine automatically location for pgn file if set to auto, otherwise the location string which is set will be used')
     parser.add_argument('-dtcs', '--def-timectrl', type=str, default='5 0', help='default time control setting when leaving an emulation engine after startup')
@@ -2494,7 +2584,8 @@ def main():
     logging.debug('#' * 20 + ' PicoChess v%s ' + '#' * 20, version)
     # log the startup parameters but hide the password fields
     a_copy = copy.copy(vars(args))
-    a_copy['mailgun_key'] = a_copy['smtp_pass'] = a_copy['engine_remote_key'] = a_copy['engine_remote_pass'] = '*****'
+    a_copy['mailgun_key'] = a_copy['smtp_pass'] = a_copy['engine_remote_key'] = a_copy['engine_remote_pass'] = \
+        a_copy['engine_remote_tcp_key'] = '*****'
     logging.debug('startup parameters: %s', a_copy)
     if unknown:
         logging.warning('invalid parameter given %s', unknown)
@@ -2593,7 +2684,11 @@ def main():
     emailer.set_smtp(sserver=args.smtp_server, suser=args.smtp_user, spass=args.smtp_pass,
                      sencryption=args.smtp_encryption, sfrom=args.smtp_from)
 
-    PgnDisplay('games' + os.sep + args.pgn_file, emailer).start()
+    annotator = None
+    if args.annotate_secs > 0:
+        annotator = PgnAnnotator(args.tutor_engine, args.annotate_secs, 'games' + os.sep + args.pgn_file)
+        annotator.start()
+    PgnDisplay('games' + os.sep + args.pgn_file, emailer, annotator).start()
     if args.pgn_user:
         user_name = args.pgn_user
     else:
@@ -2667,14 +2762,17 @@ def main():
         logging.warning('selected book not present, defaulting to %s', all_books[7]['file'])
         book_index = 7
     book_in_use = args.book
-    bookreader = chess.polyglot.open_reader(all_books[book_index]['file'])
+    book_store.open_all(all_books)
+    bookreader = book_store.get(all_books[book_index]['file'])
     searchmoves = AlternativeMover()
+    book_prefetcher = BookPrefetcher()
     interaction_mode = Mode.NORMAL
     play_mode = PlayMode.USER_WHITE  # @todo handle Mode.REMOTE too
 
     last_legal_fens = []
     done_computer_fen = None
     done_move = chess.Move.null()
+    move_overhead = MoveOverhead()
     game_declared = False  # User declared resignation or draw
     pb_move = chess.Move.null()  # safes the best ponder move so far (for permanent brain use)
 
@@ -2731,7 +2829,15 @@ def main():
     ## molli PicoTutor
     ######################
     comment_file = get_comment_file()
-    picotutor = PicoTutor(i_engine_path=tutor_engine, i_comment_file=comment_file, i_lang=args.language) ## default with stockfish engine
+    ## tutor log: written by the log sink thread, kill -USR1 <pid> switches off => normal => verbose => off
+    tutor_log_levels = {'off': LogSink.OFF, 'normal': LogSink.NORMAL, 'verbose': LogSink.VERBOSE}
+    log_sink.set_level(tutor_log_levels[args.tutor_log])
+
+    def switch_tutor_log(signum, frame):
+        log_sink.set_level((log_sink.level + 1) % (LogSink.VERBOSE + 1))
+
+    signal.signal(signal.SIGUSR1, switch_tutor_log)
+    picotutor = PicoTutor(i_engine_path=tutor_engine, i_comment_file=comment_file, i_lang=args.language, i_single_engine=args.tutor_single_engine) ## default with stockfish engine
     picotutor.set_status(dgtmenu.get_picowatcher(), dgtmenu.get_picocoach(), dgtmenu.get_picoexplorer(), dgtmenu.get_picocomment())
 
     if picotutor_mode():
@@ -2797,21 +2903,15 @@ def main():
                 remote_file = engine_remote_home + os.sep + help_str
 
                 flag_eng = False
-                flag_eng = check_ssh(args.engine_remote_server, args.engine_remote_user, args.engine_remote_pass)
+                if remote_engine_mode(): ## molli: only remote engines need the (pooled) server connection
+                    uci_remote_shell = get_remote_shell()
+                    flag_eng = uci_remote_shell is not None
 
-                logging.debug('molli check_ssh:%s', flag_eng)
+                logging.debug('molli remote connection:%s', flag_eng)
                 DisplayMsg.show(Message.ENGINE_SETUP()) ## molli
                 
                 if remote_engine_mode(): ##molli
-                    if flag_eng:
-                        if not uci_remote_shell:
-                            if remote_windows(): ## molli for Windows use specific shell type
-                                logging.info('molli: Remote Windows Connection')
-                                uci_remote_shell = UciShell(hostname=args.engine_remote_server, username=args.engine_remote_user, key_file=args.engine_remote_key, password=args.engine_remote_pass, windows=True)
-                            else:
-                                logging.info('molli: Remote Mac/UNIX Connection')
-                                uci_remote_shell = UciShell(hostname=args.engine_remote_server, username=args.engine_remote_user, key_file=args.engine_remote_key, password=args.engine_remote_pass)
-                    else:
+                    if not flag_eng:
                         time.sleep(1)
                         DisplayMsg.show(Message.ONLINE_FAILED())
                         time.sleep(1)
@@ -2836,7 +2936,7 @@ def main():
                         remote_file = engine_remote_home + os.sep + help_str
         
 
-                        if remote_engine_mode() and flag_eng(): ##molli
+                        if remote_engine_mode() and flag_eng: ##molli
                             engine = UciEngine(file=remote_file, uci_shell=uci_remote_shell)
                         else:
                             engine = UciEngine(file=old_file, uci_shell=uci_local_shell)
@@ -2945,6 +3045,7 @@ def main():
                                                    eng_text=event.eng_text, has_levels=engine.has_levels(),
                                                    has_960=engine.has_chess960(), has_ponder=engine.has_ponder(),
                                                    show_ok=event.show_ok)
+                    prelauncher.cancel()  # the user has chosen another engine than the prelaunched one
                     # Schedule cleanup of old objects
                     gc.collect()
 
@@ -3485,6 +3586,10 @@ def main():
                         # clock must be stopped BEFORE the "book_move" event cause SetNRun resets the clock display
                         stop_clock()
                         best_move_posted = True
+                        bestmove_time = engine.get_bestmove_time()
+                        if bestmove_time and not (event.inbook or emulation_mode() or online_mode() or pgn_mode()):
+                            ## engine => board latency: the engine clock still ran from its bestmove until now
+                            move_overhead.add(engine_name, board_type(), time.time() - bestmove_time)
                         # @todo 8/8/R6P/1R6/7k/2B2K1p/8/8 and sliding Ra6 over a5 to a4 - handle this in correct way!!
                         if game.is_game_over() and not online_mode():
                             logging.warning('illegal move on game_end - sliding? move: %s fen: %s', event.move, game.fen())
@@ -3682,6 +3787,7 @@ def main():
                                         
                             done_computer_fen = game_copy.board_fen()
                             done_move = event.move
+                            book_prefetcher.start(bookreader, game_copy)  # user's time => prepare the book replies
                             
                             brain_book = interaction_mode == Mode.BRAIN and event.inbook
                             pb_move = event.ponder if event.ponder and not brain_book else chess.Move.null()
@@ -3751,10 +3857,18 @@ def main():
                     msg = Message.INTERACTION_MODE(mode=event.mode, mode_text=event.mode_text, show_ok=event.show_ok)
                     set_wait_state(msg)  # dont clear searchmoves here
 
+            elif isinstance(event, Event.PRELAUNCH_ENGINE):
+                ## start slow mame/mess engines while the user is still in the menu
+                if is_emulation_engine(event.eng) and event.eng['file'] != engine.get_file() and not remote_engine_mode():
+                    prelauncher.request(event.eng['file'])
+                else:
+                    prelauncher.request(None)
+
             elif isinstance(event, Event.SET_OPENING_BOOK):
                 write_picochess_ini('book', event.book['file'])
                 logging.debug('changing opening book [%s]', event.book['file'])
-                bookreader = chess.polyglot.open_reader(event.book['file'])
+                bookreader = book_store.get(event.book['file'])
+                book_prefetcher.cancel()
                 DisplayMsg.show(Message.OPENING_BOOK(book_text=event.book_text, show_ok=event.show_ok))
                 book_in_use = event.book['file']
                 stop_fen_timer()
@@ -3925,12 +4039,7 @@ def main():
                 engine.quit() ## molli
                 
                 try:
-                    if uci_remote_shell:
-                        if uci_remote_shell.get():
-                            try:
-                               uci_remote_shell.get().__exit__(None, None, None)  # force to call __exit__ (close shell connection)
-                            except:
-                               pass
+                    remote_pool.close()  # close the remote shell connections
                 except:
                     pass
                        
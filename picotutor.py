@@ -19,15 +19,24 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import resource
 import sys
 import time
+import threading
 import chess
 import chess.uci
 import chess.engine
 import math
+from collections import OrderedDict
+import chess.polyglot
 from random import choice
 from random import randint
 from dgt.util import PicoComment
+from uci.tuner import engine_tuner, TUTOR_WEIGHT
+from uci.infoparser import FastInfoEngine, FastInfoHandler, ShallowSnapshotHandler
+from picotutor_openings import eco_trie, fen_index, OpeningTracker
+from picotutor_tables import EvalTable
+from utilities import log_sink, LogSink
 
 # PicoTutor Constants
 import picotutor_constants as c
@@ -102,30 +111,54 @@ c.UNCLEAR_DIFF         = 0.7 ## unclear position & move
     
 """
 
+
+def can_renice(nice, base):
+    """Return if this process may set a process from niceness nice back to base (lower means faster)."""
+    if base >= nice:
+        return True
+    try:
+        if os.geteuid() == 0:
+            return True
+        limit = resource.getrlimit(resource.RLIMIT_NICE)[0]  ## nice ceiling is 20 - limit
+    except (AttributeError, OSError, ValueError):
+        return False
+    return limit == resource.RLIM_INFINITY or 20 - limit <= base
+
+
 class PicoTutor:
     
-    def __init__(self, i_engine_path = '/opt/picochess/engines/armv7l/a-stockf', i_player_color = chess.WHITE, i_fen = '', i_comment_file = '', i_lang = 'en'):
+    def __init__(self, i_engine_path = '/opt/picochess/engines/armv7l/a-stockf', i_player_color = chess.WHITE, i_fen = '', i_comment_file = '', i_lang = 'en', i_single_engine = False):
         self.log_file_name  = "picotutor-log.txt"
         self.log_file = ''
         self.user_color = i_player_color
         self.max_valid_moves = 200
+        self.multipv = c.MULTIPV_MIN  ## deep engine: adapted to the number of good moves
+        self.engine_multipv = 0
         self.engine_path = i_engine_path
-        self.engine = chess.uci.popen_engine(i_engine_path)
-        self.engine2 = chess.uci.popen_engine(i_engine_path)
-        self.engine.uci()
-        self.engine2.uci()
-        self.engine.setoption({"MultiPV": self.max_valid_moves})
-        self.engine.setoption({"Contempt": 0})
-        self.engine.setoption({"Threads": c.NUM_THREADS})
-        self.engine2.setoption({"MultiPV": self.max_valid_moves})
-        self.engine2.setoption({"Contempt": 0})
-        self.engine2.setoption({"Threads": c.NUM_THREADS})
-        self.engine.isready()
-        self.engine2.isready()
-        self.info_handler = chess.uci.InfoHandler()
-        self.info_handler2 = chess.uci.InfoHandler()
-        self.engine.info_handlers.append(self.info_handler)
-        self.engine2.info_handlers.append(self.info_handler2)
+        self.engine = None
+        self.engine2 = None
+        self.single_engine = i_single_engine  ## one engine gives the low and deep depth analysis
+        self.analysis_cache = OrderedDict()  ## (position hash, deep/low) => deepest snapshot of the lines
+        self.analysis_key = None  ## position hash of the running analysis
+        self.predicted_key = None  ## position hash analysed during the opponent's thinking time
+        self.prediction_capped = False  ## that analysis runs with a time cap instead of a lower priority
+        self.engine_nice = 0  ## niceness the tutor engines run with (relative to picochess)
+        self.probe_move = None  ## user move outside the deep lines => scored by a background search
+        self.probe_handler = None  ## info handler of the deep engine during that search
+        self.probe_thread = None  ## that search - the verdict waits for it
+        self.search_lock = threading.RLock()  ## engine commands of the main & the background search thread
+        self.search_generation = 0  ## increased by pause() => results of older background searches are dropped
+        self.shallow_job = None  ## next (board, generation, movetime) of the single engine worker, False => quit
+        self.shallow_cond = threading.Condition()
+        self.shallow_thread = None  ## that worker (one per running engine)
+        self.pv_lines = {}
+        self.score_lines = {}
+        self.pv_lines2 = {}
+        self.snapshot_depth = 0
+        self.eval_table = EvalTable.from_lines({}, {})  ## legal_moves with a move index (valid if legal_moves is set)
+        self.eval_table2 = EvalTable.from_lines({}, {})
+        self.tune_pending = False
+        self.start_engines()
         self.history = []
         self.history2 = []
         self.history.append((0, chess.Move.null(), 0.00, 0))
@@ -155,18 +188,18 @@ class PicoTutor:
         self.open_log()
         
         try:
-            self.book_data = open("chess-eco_pos.txt").readlines()
-        except:
+            self.op_tracker = OpeningTracker(eco_trie("chess-eco_pos.txt"))
+        except OSError:
             self.log("ECO opening book not found!")
-            self.book_data = []
+            self.op_tracker = OpeningTracker()
         
         try:
-            self.book_fen_data = open("opening_name_fen.txt").readlines()
-        except:
+            self.book_fen_index = fen_index("opening_name_fen.txt")
+        except OSError:
             self.log("ECO FEN opening book not found!")
-            self.book_fen_data = []
+            self.book_fen_index = {}
         
-        self.log("comment_file %s" % i_comment_file)
+        self.log("comment_file %s", i_comment_file)
         if i_comment_file:
             try:
                 self.comments = open(i_comment_file).readlines()
@@ -176,8 +209,7 @@ class PicoTutor:
 
             if self.comments:
                 self.comment_no = len(self.comments)
-                self.log("found %s comments" % self.comment_no)
-                    
+                self.log("found %s comments", self.comment_no)
         try:
             general_comment_file = '/opt/picochess/engines/armv7l/general_game_comments_' + i_lang + '.txt'
             self.comments_all = open(general_comment_file).readlines()
@@ -187,8 +219,7 @@ class PicoTutor:
         
         if self.comments_all:
             self.comment_all_no = len(self.comments_all)
-            self.log("found %s comments" % self.comment_all_no)
-    
+            self.log("found %s comments", self.comment_all_no)
         if i_fen:
             self.board = chess.Board(i_fen)
         else:
@@ -217,8 +248,8 @@ class PicoTutor:
 
     def get_game_comment(self, pico_comment=PicoComment.COM_OFF, com_factor=0):
         self.log("**** start get game comment")
-        self.log("pico_comment= %s" % pico_comment)
-        self.log("com_factor= %s" % str(com_factor))
+        self.log("pico_comment= %s", pico_comment)
+        self.log("com_factor= %s", com_factor)
         max_range= 0
         max_range_all= 0
         range_fac = 0
@@ -235,7 +266,7 @@ class PicoTutor:
                 index = randint(0, max_range)
                 if index > self.comment_no-1:
                       return ''
-                self.log("found game comment %s" % self.comments[index])
+                self.log("found game comment %s", self.comments[index])
                 return self.comments[index]
             else:
                 return ''
@@ -246,14 +277,14 @@ class PicoTutor:
                 index = randint(0, max_range)
                 if index > self.comment_no-1:
                     return ''
-                self.log("found game comment %s" % self.comments[index])
+                self.log("found game comment %s", self.comments[index])
                 return self.comments[index]
             else:
                 if self.comments_all and self.comment_all_no > 0:
                     index = randint(0, max_range_all)
                     if index > self.comment_all_no-1:
                         return ''
-                    self.log("found game comment %s" % self.comments_all[index])
+                    self.log("found game comment %s", self.comments_all[index])
                     return self.comments_all[index]
                 else:
                     return ''
@@ -261,7 +292,7 @@ class PicoTutor:
     def init_comments(self, i_comment_file):
         self.comments = []
         self.comment_no = 0
-        self.log("new comment_file %s" % i_comment_file)
+        self.log("new comment_file %s", i_comment_file)
         if i_comment_file:
             try:
                 self.comments = open(i_comment_file).readlines()
@@ -271,8 +302,7 @@ class PicoTutor:
             
             if self.comments:
                 self.comment_no = len(self.comments)
-                self.log("found %s comments" % self.comment_no)
-
+                self.log("found %s comments", self.comment_no)
         else:
             self.comments = []
 
@@ -288,20 +318,9 @@ class PicoTutor:
         if self.op == [] or diff > 2:
             return(id[2], id[0], id[1], inside_book_opening)
 
-        played = '%s' % (' '.join(self.op))
-        
-        ##self.log("played:%s", played)
-        
-        for l in self.book_data:
-            h5 = l.split('"')
-            if len(h5) > 5:
-                eco, name, mv = h5[1], h5[3], h5[5]
-                
-                if played[:len(mv)] == mv:
-                    ##self.log("match1")
-                    if len(mv) > len(id[1]):
-                        id = name, mv, eco
-                        ##self.log("match2")
+        ## longest eco line matching the played moves - followed by push_move/pop_last_move
+        if self.op_tracker.opening():
+            id = self.op_tracker.opening()
         
         halfmoves = 2 * self.board.fullmove_number
         
@@ -312,8 +331,7 @@ class PicoTutor:
         if halfmoves < 0:
             halfmoves = 0
         
-        self.log("halfmoves:%s" % halfmoves)
-
+        self.log("halfmoves:%s", halfmoves)
         try:
             help = id[1].split()
         except:
@@ -336,10 +354,9 @@ class PicoTutor:
             else:
                 inside_book_opening = False
 
-        self.log("insidebook: %s" % inside_book_opening)
+        self.log("insidebook: %s", inside_book_opening)
         if id[0]:
-            self.log("opening: %s" % id[0])
-        
+            self.log("opening: %s", id[0])
         ##self.log("eco=%s, name=%s, moves=%s, book=%s", id[2], id[0], id[1], inside_book_opening)
         self.log("+++++++++get_opening end+++++++++++++")
         return(id[2], id[0], id[1], inside_book_opening)
@@ -352,23 +369,14 @@ class PicoTutor:
         
         fen = self.board.board_fen()
         
-        self.log("get_fen_opening fen= %s" % fen)
-        
+        self.log("get_fen_opening fen= %s", fen)
         if not fen:
             return("", False)
     
-        index = 0
-        op_name = ''
-        
-        for line in self.book_fen_data:
-            line_list = line.split()
-            if line_list[0] == fen:
-                op_name = self.book_fen_data[index+1]
-                break
-            index = index + 1
+        op_name = self.book_fen_index.get(fen, '')
                 
         if op_name:
-            self.log("opening: %s" % op_name)
+            self.log("opening: %s", op_name)
             self.log("+++++++ get_opening end +++++++++")
             return (op_name, True)
         else:
@@ -376,50 +384,118 @@ class PicoTutor:
             return ("", False)
 
     def open_log(self):
-        try:
-            self.log_file = open(self.log_file_name, 'w')
-        except:
-            self.log_file = ''
-            print("# Could not create log file")
-    
-    def log(self, x):
-        pass
-        """
-        if self.log:
-           
-            self.log_file.write("< %s\n" % x)
-            self.log_file.flush()
-        """
+        ## the file gets created by the log sink with its first line
+        self.log_file = self.log_file_name
+    
+    def log(self, x, *args, level=LogSink.NORMAL):
+        ## only buffered here, the log sink thread formats & writes it (x % args)
+        if args:
+            log_sink.write(self.log_file, level, "< " + x, *args)
+        else:
+            log_sink.write(self.log_file, level, "< %s", x)
     
+    def log_dump(self, title, items):
+        ## history & move lists only on verbose - copied as they change after this call
+        if log_sink.enabled(LogSink.VERBOSE):
+            self.log(title, level=LogSink.VERBOSE)
+            self.log(tuple(items), level=LogSink.VERBOSE)
+    
+    def start_engines(self):
+        ## both tutor engines share the cores & memory with the playing engine
+        self.engine = chess.uci.popen_engine(self.engine_path, engine_cls=FastInfoEngine)
+        self.engine.uci()
+        engine_tuner.register('picotutor', weight=TUTOR_WEIGHT, callback=self.rebalance)
+        self.engine.setoption({"MultiPV": self.multipv})
+        self.engine_multipv = self.multipv
+        self.engine.setoption({"Contempt": 0})
+        self.engine.setoption(self.tuned_options('picotutor', self.engine))
+        self.engine.isready()
+        if self.single_engine:
+            ## the low depth lines come from a full width pass of this engine before its deep search
+            self.info_handler = ShallowSnapshotHandler()
+            self.engine.info_handlers.append(self.info_handler)
+            self.tune_pending = False
+            return
+        self.engine2 = chess.uci.popen_engine(self.engine_path, engine_cls=FastInfoEngine)
+        self.engine2.uci()
+        engine_tuner.register('picotutor2', weight=TUTOR_WEIGHT, callback=self.rebalance)
+        self.engine2.setoption({"MultiPV": self.max_valid_moves})
+        self.engine2.setoption({"Contempt": 0})
+        self.engine2.setoption(self.tuned_options('picotutor2', self.engine2))
+        self.engine2.isready()
+        ## only multipv/score/pv/depth are parsed, pv moves only when used (MultiPV 200 of engine2 => many info lines)
+        self.info_handler = FastInfoHandler()
+        self.info_handler2 = FastInfoHandler()
+        self.engine.info_handlers.append(self.info_handler)
+        self.engine2.info_handlers.append(self.info_handler2)
+        self.tune_pending = False
+
+    def low_depth_info(self):
+        ## (handler, info dict) of the low depth search
+        if self.single_engine:
+            return self.info_handler, self.info_handler.shallow
+        return self.info_handler2, self.info_handler2.info
+
+    def snapshot(self, handler, info, kind):
+        ## copy of the analysis lines - or the cached ones if the position was analysed deeper before
+        with handler:
+            lines = {"depth": info.get("depth") or 0, "pv": dict(info.get("pv", {})),
+                     "score": dict(info.get("score", {}))}
+        if self.analysis_key is None:
+            return lines
+        key = (self.analysis_key, kind)
+        cached = self.analysis_cache.get(key)
+        if cached and cached["depth"] >= lines["depth"]:
+            self.analysis_cache.move_to_end(key)
+            self.log("Cached analysis (depth %s) used" % cached["depth"])
+            return cached
+        if lines["pv"]:
+            self.analysis_cache[key] = lines
+            self.analysis_cache.move_to_end(key)
+            while len(self.analysis_cache) > c.ANALYSIS_CACHE_SIZE:
+                self.analysis_cache.popitem(last=False)
+        return lines
+
+    def tuned_options(self, name, engine):
+        return engine_tuner.tune(name, engine.options, {"Threads": c.NUM_THREADS}, weight=TUTOR_WEIGHT,
+                                 max_threads=c.NUM_THREADS)
+
+    def engines_alive(self):
+        try:
+            if self.single_engine:
+                return bool(self.engine and self.engine.is_alive())
+            return bool(self.engine and self.engine2 and self.engine.is_alive() and self.engine2.is_alive())
+        except chess.uci.EngineTerminatedException:
+            return False
+
+    def rebalance(self):
+        ## tuner callback: new Threads/Hash are sent at the next start of the analysis
+        self.tune_pending = True
+
     def reset(self):
         self.pos = False
         self.log("Tutor reset / newgame")
         self.legal_moves = []
         self.legal_moves2 = []
         self.op = []
+        self.op_tracker.reset()
         self.user_color = chess.WHITE
         self.board = chess.Board()
         
-        self.stop()
-        
-        self.engine = chess.uci.popen_engine(self.engine_path)
-        self.engine2 = chess.uci.popen_engine(self.engine_path)
-        self.engine.uci()
-        self.engine2.uci()
-        self.engine.setoption({"MultiPV": self.max_valid_moves})
-        self.engine.setoption({"Contempt": 0})
-        self.engine.setoption({"Threads": c.NUM_THREADS})
-        self.engine2.setoption({"MultiPV": self.max_valid_moves})
-        self.engine2.setoption({"Contempt": 0})
-        self.engine2.setoption({"Threads": c.NUM_THREADS})
-        self.engine.isready()
-        self.engine2.isready()
-        self.info_handler = chess.uci.InfoHandler()
-        self.info_handler2 = chess.uci.InfoHandler()
-        self.engine.info_handlers.append(self.info_handler)
-        self.engine2.info_handlers.append(self.info_handler2)
+        if self.engines_alive():
+            ## keep the running engines (and their options) - a new game only needs "ucinewgame"
+            self.pause()
+            self.engine.ucinewgame()
+            self.engine.isready()
+            if self.engine2:
+                self.engine2.ucinewgame()
+                self.engine2.isready()
+        else:
+            self.stop()
+            self.start_engines()
         self.engine.position(self.board)
-        self.engine2.position(self.board)
+        if self.engine2:
+            self.engine2.position(self.board)
         
         self.history = []
         self.history2 = []
@@ -466,8 +542,9 @@ class PicoTutor:
         chess.Board.turn = i_turn
         self.engine.position(self.board)
         ##self.engine.isready()
-        self.engine2.position(self.board)
-        ##self.engine2.isready()
+        if self.engine2:
+            self.engine2.position(self.board)
+            ##self.engine2.isready()
         self.pos = True
         
         if self.board.turn == self.user_color:
@@ -483,22 +560,33 @@ class PicoTutor:
         self.log("------------------------------------")
         self.log("Tutor engine push")
         if not i_uci_move in self.board.legal_moves:
-            self.log("Move is invalid: %s" % i_uci_move)
+            self.log("Move is invalid: %s", i_uci_move)
             return(False)
         
         self.op.append(self.board.san(i_uci_move))
+        self.op_tracker.push(self.op[-1])
         self.board.push(i_uci_move)
         
         if not(self.coach_on or self.watcher_on):
             return(True)
         
+        if self.board.turn == self.user_color and self.prediction_hit():
+            ## the opponent played the expected move => the running analysis continues
+            self.log("Tutor prediction hit: %s", i_uci_move)
+            if self.prediction_capped:
+                self.pause()  ## restart it without time cap - the hash keeps what is already searched
+                self.start()
+            else:
+                self.set_engine_priority(0)
+            return(True)
+        
         self.pause()
         self.engine.position(self.board)
         self.engine.isready()
-        self.engine2.position(self.board)
-        self.engine2.isready()
-        self.log("Valid move: %s" % i_uci_move)
-        
+        if self.engine2:
+            self.engine2.position(self.board)
+            self.engine2.isready()
+        self.log("Valid move: %s", i_uci_move)
         if self.board.turn == self.user_color:
             ## if it is user player's turn then start analyse engine
             ## otherwise it is computer opponents turn and analysis engine
@@ -510,9 +598,63 @@ class PicoTutor:
             self.eval_legal_moves2()
             self.eval_user_move(i_uci_move) ## determine & save evaluation of user move
             self.eval_user_move2(i_uci_move) ## determine & save evaluation of user move
+            if self.probe_move is not None:
+                self.start_probe(self.probe_move)  ## starts the prediction once the move is scored
+            else:
+                self.start_prediction()
     
         return(True)
 
+    def start_prediction(self):
+        ## analyse the position after the expected opponent move (of the user move pv) while the
+        ## opponent thinks - with a lower cpu priority than the playing engine
+        if len(self.pv_user_move) < 2 or self.board.is_game_over():
+            return
+        reply = self.pv_user_move[1]
+        if reply not in self.board.legal_moves:
+            return
+        board = self.board.copy()
+        board.push(reply)
+        if board.is_game_over():
+            return
+        ## without the right to raise the priority again the search gets a time cap instead
+        self.prediction_capped = not self.set_engine_priority(c.BACKGROUND_NICE)
+        self.start(board, movetime=c.PREDICTION_TIME if self.prediction_capped else None)
+        self.predicted_key = self.analysis_key
+        self.log("Tutor analyses expected move: %s", reply)
+
+    def prediction_hit(self):
+        hit = self.predicted_key is not None and self.predicted_key == chess.polyglot.zobrist_hash(self.board)
+        self.predicted_key = None
+        return hit
+
+    def set_engine_priority(self, nice):
+        ## nice the tutor engines relative to picochess - returns False if they dont run with it:
+        ## a lowered priority is only set if it can be raised again (root or RLIMIT_NICE)
+        if nice == self.engine_nice:
+            return True
+        try:
+            base = os.getpriority(os.PRIO_PROCESS, 0)
+        except (AttributeError, OSError):
+            return False
+        if nice > self.engine_nice and not can_renice(base + self.engine_nice, base):
+            return False
+        for engine in (self.engine, self.engine2):
+            if engine:
+                try:
+                    pid = engine.process.process.pid
+                except AttributeError:
+                    continue  ## no local process
+                try:
+                    os.setpriority(os.PRIO_PROCESS, pid, base + nice)
+                except OSError as os_exc:
+                    self.log("Tutor engine priority not set: %s", os_exc)
+                try:
+                    self.engine_nice = os.getpriority(os.PRIO_PROCESS, pid) - base
+                except OSError:
+                    pass
+        return self.engine_nice == nice
+
     def pop_last_move(self):
         self.log("Tutor engine pop")
         back_move = chess.Move.null()
@@ -525,8 +667,10 @@ class PicoTutor:
             try:
                 if self.op:
                     self.op.pop()
+                    self.op_tracker.pop()
             except:
                 self.op = []
+                self.op_tracker.reset()
             
             if not(self.coach_on or self.watcher_on):
                 return chess.Move.null()
@@ -534,8 +678,9 @@ class PicoTutor:
             self.pause()
             self.engine.position(self.board)
             self.engine.isready()
-            self.engine2.position(self.board)
-            self.engine2.isready()
+            if self.engine2:
+                self.engine2.position(self.board)
+                self.engine2.isready()
             self.log('backmove =%s' % back_move)
             try:
                 if self.history:
@@ -574,20 +719,85 @@ class PicoTutor:
     def get_move_counter(self):
         return(self.board.fullmove_number)
     
-    def start(self):
-        ## after newgame event
-        if self.engine2:
-            self.engine2.position(self.board)
-            self.engine2.go(depth=c.LOW_DEPTH, async_callback=True)
-        
-        if self.engine:
-            self.engine.position(self.board)
-            self.engine.go(depth=c.DEEP_DEPTH, async_callback=True)
+    def start(self, board=None, movetime=None):
+        ## after newgame event - analyses the current board or the given (expected) one,
+        ## with movetime (ms) the searches stop after this time
+        if board is None:
+            board = self.board
+        with self.search_lock:
+            self.end_probe()
+            if self.tune_pending and self.engine:
+                self.engine.setoption(self.tuned_options('picotutor', self.engine))
+                if self.engine2:
+                    self.engine2.setoption(self.tuned_options('picotutor2', self.engine2))
+                self.tune_pending = False
+            if self.engine and self.engine_multipv != self.multipv and not self.single_engine:
+                self.engine.setoption({"MultiPV": self.multipv})
+                self.engine_multipv = self.multipv
+            self.analysis_key = chess.polyglot.zobrist_hash(board)
+            if self.engine2:
+                self.engine2.position(board)
+                self.engine2.go(depth=c.LOW_DEPTH, movetime=movetime, async_callback=True)
+            
+            if self.engine and self.single_engine:
+                self.queue_shallow_then_deep((board.copy(), self.search_generation, movetime))
+            elif self.engine:
+                self.engine.position(board)
+                self.engine.go(depth=c.DEEP_DEPTH, movetime=movetime, async_callback=True)
         self.log("Tutor engine started")
+
+    def queue_shallow_then_deep(self, job):
+        ## hand the search to the worker - an older job still waiting there is replaced
+        with self.shallow_cond:
+            self.shallow_job = job
+            if self.shallow_thread is None or not self.shallow_thread.is_alive():
+                self.shallow_thread = threading.Thread(target=self.shallow_worker, name='tutor shallow pass')
+                self.shallow_thread.daemon = True
+                self.shallow_thread.start()
+            self.shallow_cond.notify()
+
+    def shallow_worker(self):
+        while True:
+            with self.shallow_cond:
+                while self.shallow_job is None:
+                    self.shallow_cond.wait()
+                job, self.shallow_job = self.shallow_job, None
+            if job is False:
+                return
+            self.shallow_then_deep(*job)
+
+    def shallow_then_deep(self, board, generation, movetime=None):
+        ## single engine: a full width low depth pass (every move gets a low depth score) before the
+        ## narrow deep search - in this order the low depth scores dont see the hash of the deep search
+        with self.search_lock:
+            if generation != self.search_generation or not self.engine:
+                return
+            handler = self.info_handler
+            handler.begin_shallow()
+            self.engine.setoption({"MultiPV": self.max_valid_moves})
+            self.engine.position(board)
+            future = self.engine.go(depth=c.LOW_DEPTH, async_callback=True)
+        try:
+            future.result()
+        except chess.uci.EngineTerminatedException:
+            return
+        finally:
+            handler.end_shallow()
+        with self.search_lock:
+            if generation != self.search_generation or not self.engine:
+                return
+            self.engine.setoption({"MultiPV": self.multipv})
+            self.engine_multipv = self.multipv
+            self.engine.position(board)
+            self.engine.go(depth=c.DEEP_DEPTH, movetime=movetime, async_callback=True)
     
     def pause(self):
         ## during thinking time of opponent tutor should be paused
         ## after the user move has been pushed
+        self.predicted_key = None
+        with self.search_lock:
+            self.search_generation += 1
+        self.set_engine_priority(0)
         if self.engine:
             self.engine.stop()
         if self.engine2:
@@ -595,6 +805,20 @@ class PicoTutor:
         self.log("Tutor engine paused")
     
     def stop(self):
+        engine_tuner.unregister('picotutor', self.rebalance)
+        engine_tuner.unregister('picotutor2', self.rebalance)
+        with self.search_lock:
+            self.search_generation += 1
+            self.end_probe()
+        if self.shallow_thread:
+            with self.shallow_cond:
+                self.shallow_job = False
+                self.shallow_cond.notify()
+            if self.engine:
+                self.engine.stop()  ## ends a running shallow pass
+            self.shallow_thread.join(5)
+            self.shallow_thread = None
+            self.shallow_job = None
         if self.engine:
             self.engine.stop()
             self.engine.quit()
@@ -622,29 +846,133 @@ class PicoTutor:
         eval = 0
         mate = 0
         loop_move = chess.Move.null()
-        j = 0
-        while loop_move != user_move and j < len(self.legal_moves):
-            (pv_no, loop_move, eval, mate) = self.legal_moves[j]
-            j = j + 1
+        if self.legal_moves:
+            ## the row of the user move or (like before) the worst line if the move isnt found
+            row = self.eval_table.find(user_move)
+            (pv_no, loop_move, eval, mate) = self.eval_table.row(-1 if row is None else row)
+
+        user_pv = None
+        self.probe_move = None
+        if loop_move != user_move and self.legal_moves:
+            ## user move outside the narrow MultiPV => its low depth score for now, a targeted search
+            ## in the background replaces it (see start_probe)
+            row2 = self.eval_table2.find(user_move) if self.legal_moves2 else None
+            if row2 is not None:
+                (pv_no2, _, eval, mate) = self.eval_table2.row(row2)
+                user_pv = self.pv_lines2.get(pv_no2)
+            pv_no = len(self.legal_moves) + 1
+            loop_move = user_move
+            self.probe_move = user_move
 
         ## add score to history list
         if loop_move == chess.Move.null() or loop_move != user_move:
             self.history.append((pv_no, user_move, eval, mate))
         else:
             self.history.append((pv_no, loop_move, eval, mate))
-        if j > 0 and pv_no > 0:
-            self.pv_best_move = self.info_handler.info["pv"][1]
-            self.pv_user_move = self.info_handler.info["pv"][pv_no]
+        if self.legal_moves and pv_no > 0:
+            self.pv_best_move = self.pv_lines[1]
+            if self.probe_move is not None:
+                self.pv_user_move = list(user_pv) if user_pv else [user_move]
+            else:
+                self.pv_user_move = self.pv_lines[pv_no]
         else:
             self.pv_best_move = []
             self.pv_user_move = []
         
-        self.log("History:")
-        self.log(self.history)
+        self.log_dump("History:", self.history)
         self.log("----------------------------------")
-        self.log("PV Best line: %s" % str(self.pv_best_move))
-        self.log("PV User line: %s" % str(self.pv_user_move))
+        self.log("PV Best line: %s", self.pv_best_move, level=LogSink.VERBOSE)
+        self.log("PV User line: %s", self.pv_user_move, level=LogSink.VERBOSE)
 
+    def start_probe(self, user_move):
+        ## score the user move outside the deep lines in the background - push_move returns at once,
+        ## get_user_move_eval/get_user_move_info wait for the result (max. USER_MOVE_TIME)
+        board = self.board.copy()
+        board.pop()  ## the user move is already pushed
+        index = len(self.history) - 1
+        self.probe_thread = threading.Thread(target=self.probe_user_move,
+                                             args=(board, user_move, index, self.search_generation),
+                                             name='tutor probe')
+        self.probe_thread.daemon = True
+        self.probe_thread.start()
+
+    def wait_probe(self):
+        ## the verdict & threat line need the searched score of the user move, not the low depth one
+        thread = self.probe_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(c.USER_MOVE_TIME / 1000 + c.PROBE_WAIT_MARGIN)
+            if thread.is_alive():
+                self.log("Tutor probe too slow - verdict with the low depth score")
+        self.probe_thread = None
+
+    def probe_user_move(self, board, user_move, index, generation):
+        ## "go searchmoves" up to the depth of the MultiPV snapshot - the result replaces the
+        ## provisional history entry unless the tutor was paused meanwhile (next move, takeback...)
+        depth = self.snapshot_depth or c.DEEP_DEPTH
+        handler = FastInfoHandler()
+        with self.search_lock:
+            if generation != self.search_generation or not self.engine:
+                return
+            self.end_probe()
+            self.engine.info_handlers.remove(self.info_handler)  ## keep the snapshot of the MultiPV search
+            self.engine.info_handlers.append(handler)
+            self.probe_handler = handler
+            self.set_engine_priority(c.BACKGROUND_NICE)  ## the opponent engine thinks already
+            self.engine.position(board)
+            future = self.engine.go(searchmoves=[user_move], depth=depth, movetime=c.USER_MOVE_TIME,
+                                    async_callback=True)
+        try:
+            future.result()
+        except chess.uci.EngineTerminatedException:
+            return
+        finally:
+            with self.search_lock:
+                if self.probe_handler is handler:
+                    self.end_probe()
+        with self.search_lock:
+            if generation != self.search_generation or len(self.history) != index + 1:
+                return
+            with handler:
+                score_val = handler.info["score"].get(1)
+                pv = handler.info["pv"].get(1)
+            if score_val and pv and pv[0] == user_move:
+                score, mate = self.score_value(score_val)
+                pv_no = self.history[index][0]
+                self.history[index] = (pv_no, user_move, score, mate)
+                self.pv_user_move = list(pv)
+                self.log("Searched user move %s: %s (depth %s)" % (user_move, score, depth))
+            self.start_prediction()
+
+    def end_probe(self):
+        ## give the deep engine its info handler back (needs the search lock)
+        if self.probe_handler is not None and self.engine:
+            self.engine.info_handlers.remove(self.probe_handler)
+            self.engine.info_handlers.append(self.info_handler)
+        self.probe_handler = None
+
+    @staticmethod
+    def score_value(score_val):
+        ## uci score => (pawns, mate) like the tutor lists use them
+        score = 0
+        mate = 0
+        if score_val.cp:
+            score = score_val.cp/100
+        if score_val.mate:
+            mate = int(score_val.mate)
+            if mate < 0:
+                score = -999
+            elif mate > 0:
+                score = 999
+        return score, mate
+
+    def adapt_multipv(self):
+        ## widen the MultiPV while even its last line is a good alternative, narrow it again otherwise
+        if len(self.legal_moves) < self.multipv:
+            return
+        if len(self.alt_best_moves) >= len(self.legal_moves):
+            self.multipv = min(2 * self.multipv, c.MULTIPV_MAX)
+        elif 2 * len(self.alt_best_moves) < self.multipv:
+            self.multipv = max(self.multipv // 2, c.MULTIPV_MIN)
 
     def eval_user_move2(self, user_move):
         if not(self.coach_on or self.watcher_on):
@@ -653,10 +981,12 @@ class PicoTutor:
         eval = 0
         mate = 0
         loop_move = chess.Move.null()
-        j = 0
-        while loop_move != user_move and j < len(self.legal_moves2):
-            (pv_no, loop_move, eval, mate) = self.legal_moves2[j]
-            j = j + 1
+        if self.legal_moves2:
+            row = self.eval_table2.find(user_move)
+            (pv_no, loop_move, eval, mate) = self.eval_table2.row(-1 if row is None else row)
+
+        ## all moves have a low depth line (a move outside gets the score of the worst line - only if
+        ## the user moved before the low depth search was finished)
         
         ## add score to history list
         if loop_move == chess.Move.null() or loop_move != user_move:
@@ -664,18 +994,17 @@ class PicoTutor:
         else:
             self.history2.append((pv_no, loop_move, eval, mate))
         
-        if j > 0 and pv_no > 0:
-            self.pv_best_move2 = self.info_handler2.info["pv"][1]
-            self.pv_user_move2 = self.info_handler2.info["pv"][pv_no]
+        if self.legal_moves2 and pv_no > 0:
+            self.pv_best_move2 = self.pv_lines2[1]
+            self.pv_user_move2 = self.pv_lines2[pv_no]
         else:
             self.pv_best_move2 = []
             self.pv_user_move2 = []
         
-        self.log("History2:")
-        self.log(self.history2)
+        self.log_dump("History2:", self.history2)
         self.log("----------------------------------")
-        self.log("PV Best line2: %s" % str(self.pv_best_move2))
-        self.log("PV User line2: %s" % str(self.pv_user_move2))
+        self.log("PV Best line2: %s", self.pv_best_move2, level=LogSink.VERBOSE)
+        self.log("PV User line2: %s", self.pv_user_move2, level=LogSink.VERBOSE)
 
     def sort_score(self, tupel):
         return tupel[2]
@@ -686,56 +1015,24 @@ class PicoTutor:
         ##with self.info_handler:
         self.log("Analyzing moves...")
         self.legal_moves = []
-        best_score = -999
         self.alt_best_moves = []
         
-        pv_list = self.info_handler.info["pv"]
+        lines = self.snapshot(self.info_handler, self.info_handler.info, "deep")
+        self.pv_lines = lines["pv"]
+        self.score_lines = lines["score"]
+        self.snapshot_depth = lines["depth"]
         
-        if pv_list:
-            
-            ##self.log("PVs:")
-            ##self.log(pv_list)
+        if lines["pv"]:
             self.log("...........................................")
-            
-            for pv_key, pv_list in pv_list.items():
-                ##self.log("%s.Zug" %j)
-                ##self.log(self.info_handler.info["pv"][j][0])
-                if self.info_handler.info["score"][pv_key]:
-                    score_val = self.info_handler.info["score"][pv_key]
-                    move = chess.Move.null()
-                    
-                    score = 0
-                    mate = 0
-                    ##self.log(self.info_handler.info["score"][j].cp/100)
-                    if score_val.cp:
-                        score = score_val.cp/100
-                        ##if self.user_color == chess.BLACK:
-                            ##score = (-1) * score
-                    if pv_list[0]:
-                        move = pv_list[0]
-                    if score_val.mate:
-                        mate = int(score_val.mate)
-                        if mate < 0:
-                            score = -999
-                        elif mate > 0:
-                            score = 999
-                    self.legal_moves.append((pv_key, move, score, mate))
-                    if score >= best_score:
-                        best_score = score
-        
-            ## collect possible good alternative moves
-            self.legal_moves.sort(key = self.sort_score, reverse = True)
-            for (pv_key, move, score, mate) in self.legal_moves:
-                if move:
-                    diff = abs(best_score - score)
-                    if diff <= 0.2:
-                        self.alt_best_moves.append(move)
-        
-        self.log("Legal Moves:")
-        self.log(self.legal_moves)
-
-        self.log("ALt. best moves:")
-        self.log(self.alt_best_moves)
+            ## table sorted by score (tupel (pv,move,score,mate) rows) & possible good alternative moves
+            self.eval_table = EvalTable.from_lines(lines["pv"], lines["score"])
+            self.legal_moves = self.eval_table.to_list()
+            self.alt_best_moves = self.eval_table.alternatives(c.ALT_MOVE_TH)
+            self.adapt_multipv()
+        
+        self.log_dump("Legal Moves:", self.legal_moves)
+
+        self.log_dump("ALt. best moves:", self.alt_best_moves)
 
     def eval_legal_moves2(self):
         if not(self.coach_on or self.watcher_on):
@@ -744,45 +1041,21 @@ class PicoTutor:
         self.log("Analyzing moves2...")
         self.legal_moves2 = []
         
-        pv_list = self.info_handler2.info["pv"]
-        
-        if pv_list:
+        lines = self.snapshot(*self.low_depth_info(), "low")
+        self.pv_lines2 = lines["pv"]
         
-            ##self.log("PVs:")
-            ##self.log(pv_list)
+        if lines["pv"]:
             self.log("...........................................")
-            
-            for pv_key, pv_list in pv_list.items():
-                ##self.log("%s.Zug" %j)
-                ##self.log(self.info_handler.info["pv"][j][0])
-                if self.info_handler2.info["score"][pv_key]:
-                    score_val = self.info_handler2.info["score"][pv_key]
-                    move = chess.Move.null()
-                    score = 0
-                    mate = 0
-                    ##self.log(self.info_handler.info["score"][j].cp/100)
-                    if score_val.cp:
-                        score = score_val.cp/100
-                        ##if self.user_color == chess.BLACK:
-                        ##score = -1 * score
-                    if pv_list[0]:
-                        move = pv_list[0]
-                    if score_val.mate:
-                        mate = int(score_val.mate)
-                        if mate < 0:
-                            score = -999
-                        elif mate > 0:
-                            score = 999
-                    self.legal_moves2.append((pv_key, move, score, mate))
-    
-        self.legal_moves2.sort(key = self.sort_score, reverse = True)
-        self.log("Legal Moves2:")
-        self.log(self.legal_moves2)
+            self.eval_table2 = EvalTable.from_lines(lines["pv"], lines["score"])
+            self.legal_moves2 = self.eval_table2.to_list()
+    
+        self.log_dump("Legal Moves2:", self.legal_moves2)
 
     def get_user_move_eval(self):
         if not(self.coach_on or self.watcher_on):
             return
         self.log("Tutor get_user_move_eval")
+        self.wait_probe()
         eval_string = ''
         best_mate = 0
         best_score = 0
@@ -828,31 +1101,29 @@ class PicoTutor:
         self.log("**************************************")
         
         if current_pv:
-            self.log("current_pv %s" % current_pv)
+            self.log("current_pv %s", current_pv)
         if current_score:
-            self.log("current_score %s" % current_score)
+            self.log("current_score %s", current_score)
         if current_mate:
-            self.log("current_mate %s" % current_mate)
+            self.log("current_mate %s", current_mate)
         if before_pv:
-            self.log("before_pv %s" % before_pv)
+            self.log("before_pv %s", before_pv)
         if before_score:
-            self.log("before_score %s" % before_score)
+            self.log("before_score %s", before_score)
         if before_mate:
-            self.log("before_mate %s" % before_mate)
-        
+            self.log("before_mate %s", before_mate)
         ## best deep engine score/move
         if self.legal_moves:
             best_pv, best_move, best_score, best_mate = self.legal_moves[0] ## tupel (pv,move,score,mate)
 
         if best_pv:
-            self.log("best pv %s" % best_pv)
+            self.log("best pv %s", best_pv)
         if best_move:
-            self.log("best move %s" % best_move)
+            self.log("best move %s", best_move)
         if best_score:
-            self.log("best score %s" % best_score)
+            self.log("best score %s", best_score)
         if best_mate:
-            self.log("best mate %s" % best_mate)
-        
+            self.log("best mate %s", best_mate)
         ##calculate diffs based on low depth search for obvious moves
         if len(self.history2) > 0:
             try:
@@ -877,11 +1148,10 @@ class PicoTutor:
         deep_low_diff   = current_score - low_score
         score_hist_diff = current_score - before_score
 
-        self.log("best_low_diff %s" % best_low_diff)
-        self.log("best_deep_diff %s" % best_deep_diff)
-        self.log("deep_low_diff %s" % deep_low_diff)
-        self.log("score_hist_diff %s" % score_hist_diff)
-        
+        self.log("best_low_diff %s", best_low_diff)
+        self.log("best_deep_diff %s", best_deep_diff)
+        self.log("deep_low_diff %s", deep_low_diff)
+        self.log("score_hist_diff %s", score_hist_diff)
         ## count legal moves in current position (for this we have to undo the user move)
         board_copy = self.board.copy()
         board_copy.pop()
@@ -907,8 +1177,7 @@ class PicoTutor:
             eval_string = '?!'
 
         if eval_string != '':
-            self.log("Intermediate Calc: bad: %s" % eval_string)
-            
+            self.log("Intermediate Calc: bad: %s", eval_string)
         ###############################################################
         ## 2. good moves
         ##############################################################
@@ -930,7 +1199,7 @@ class PicoTutor:
             eval_string2 = '!?'
 
         if eval_string2 != '':
-            self.log("Intermediate Calc: good: %s" % eval_string2)
+            self.log("Intermediate Calc: good: %s", eval_string2)
             if eval_string == '':
                 eval_string = eval_string2
 
@@ -940,8 +1209,7 @@ class PicoTutor:
         self.mate = current_mate
         self.hint_move = best_move
 
-        self.log("eval_string %s" % eval_string)
-
+        self.log("eval_string %s", eval_string)
         return eval_string, self.mate, self.hint_move
 
         
@@ -949,6 +1217,7 @@ class PicoTutor:
         if not(self.coach_on or self.watcher_on):
             return
         self.log("Tutor get_user_move_info")
+        self.wait_probe()
         return self.mate, self.hint_move, self.pv_best_move, self.pv_user_move 
 
     def get_pos_analysis(self):
@@ -965,12 +1234,12 @@ class PicoTutor:
         self.eval_legal_moves2()  ## take snapshot of current evaluation
         
         try:
-            best_move = self.info_handler.info["pv"][1][0]
+            best_move = self.pv_lines[1][0]
         except:
             best_move = ''
         
         try:
-            best_score = self.info_handler.info["score"][1]
+            best_score = self.score_lines[1]
         except:
             best_score = 0
         
@@ -980,7 +1249,7 @@ class PicoTutor:
             mate = best_score.mate
         
         try:
-            pv_best_move = self.info_handler.info["pv"][1]
+            pv_best_move = self.pv_lines[1]
         except:
             pv_best_move = []
         
@@ -989,7 +1258,7 @@ class PicoTutor:
         elif mate < 0:
             score = -999
 
-        self.log("Tutor engine best_move = %s" % str(best_move))
-        self.log("Tutor engine best_score = %s" % str(score))
-        self.log("Tutor engine mate = %s" % str(mate))
+        self.log("Tutor engine best_move = %s", best_move)
+        self.log("Tutor engine best_score = %s", score)
+        self.log("Tutor engine mate = %s", mate)
         return best_move, score, mate, pv_best_move, self.alt_best_moves
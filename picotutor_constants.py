@@ -2,7 +2,15 @@
 
 LOW_DEPTH            = 5  ## for 'obvious moves' calculation
 DEEP_DEPTH           = 17 ## for best move calculation
-NUM_THREADS          = 1  ## number of parallel threads (should not be higher)
+NUM_THREADS          = 1  ## max. number of threads per tutor engine (the tuner may use less)
+MULTIPV_MIN          = 6  ## narrow MultiPV of the deep engine (top candidate moves)
+MULTIPV_MAX          = 48 ## widest MultiPV if many moves are as good as the best one
+USER_MOVE_TIME       = 1000 ## max. ms for scoring a user move outside the MultiPV (searchmoves)
+PROBE_WAIT_MARGIN    = 0.5 ## secs the verdict waits longer than USER_MOVE_TIME for that score
+ALT_MOVE_TH          = 0.2 ## difference to best move for a good alternative move
+ANALYSIS_CACHE_SIZE  = 256 ## positions with a cached tutor analysis (takebacks & re-plays)
+BACKGROUND_NICE      = 10 ## cpu priority of the tutor engines while the opponent engine thinks
+PREDICTION_TIME      = 2000 ## max. ms of that search if the priority cant be raised again (no root)
 
 VERY_BAD_MOVE_TH     = 2.5 ## difference user to best move ??
 BAD_MOVE_TH          = 1.5 ## difference user to best move ?
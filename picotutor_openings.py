@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2013-2019 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#                         Molli (and thanks to Martin  for his opening
+#                         identification code)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import pickle
+import threading
+
+CACHE_VERSION = 2
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')  # precompiled indexes (not in git)
+
+_indexes = {}  # source file => index (shared by all PicoTutor instances)
+_indexes_lock = threading.Lock()
+
+
+def _cache_name(source: str, kind: str):
+    return os.path.join(CACHE_DIR, '{}.{}.cache'.format(os.path.basename(source), kind))
+
+
+def _source_stamp(source: str):
+    """Return the (mtime, size) of source - a cache is only valid for exactly this file version."""
+    stat = os.stat(source)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_cache(source: str, kind: str):
+    """Return the precompiled index of source or None if the cache is missing/outdated."""
+    try:
+        with open(_cache_name(source, kind), 'rb') as cache_file:
+            version, cache_kind, stamp, index = pickle.load(cache_file)
+    except (OSError, EOFError, ValueError, TypeError, AttributeError, pickle.UnpicklingError):
+        return None
+    if version != CACHE_VERSION or cache_kind != kind or stamp != _source_stamp(source):
+        return None
+    return index
+
+
+def _write_cache(source: str, kind: str, index):
+    cache = _cache_name(source, kind)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache + '.tmp', 'wb') as cache_file:
+            pickle.dump((CACHE_VERSION, kind, _source_stamp(source), index), cache_file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(cache + '.tmp', cache)
+    except OSError:
+        pass  # read only installation => build it again next time
+
+
+def _load_index(source: str, kind: str, build):
+    """Return the index of source - from memory, from its precompiled cache or build (and cache) it.
+
+    Raises OSError if the source file is missing.
+    """
+    with _indexes_lock:
+        if (source, kind) in _indexes:
+            return _indexes[(source, kind)]
+        os.stat(source)
+        index = _read_cache(source, kind)
+        if index is None:
+            with open(source, encoding='utf-8') as source_file:
+                index = build(source_file)
+            _write_cache(source, kind, index)
+        _indexes[(source, kind)] = index
+        return index
+
+
+def san_key(san: str):
+    """Return the san without check/mate sign (the eco file mostly doesnt have them)."""
+    return san.rstrip('+#')
+
+
+class EcoNode(object):
+
+    """Node of the eco trie: the next san moves and the opening (name, moves, eco) ending here."""
+
+    __slots__ = ('children', 'entry')
+
+    def __init__(self):
+        self.children = {}
+        self.entry = None
+
+    def __getstate__(self):
+        return self.children, self.entry
+
+    def __setstate__(self, state):
+        self.children, self.entry = state
+
+
+def build_eco_trie(lines):
+    """Build the move trie of the eco file lines: ("eco" "name" "san moves")."""
+    root = EcoNode()
+    for line in lines:
+        parts = line.split('"')
+        if len(parts) > 5:
+            eco, name, moves = parts[1], parts[3], parts[5]
+            node = root
+            for san in moves.split():
+                node = node.children.setdefault(san_key(san), EcoNode())
+            if node is not root and node.entry is None:  # like before the first line of the same moves wins
+                node.entry = (name, moves, eco)
+    return root
+
+
+def eco_trie(source='chess-eco_pos.txt'):
+    """Return the (shared) eco trie root of the source file."""
+    return _load_index(source, 'eco', build_eco_trie)
+
+
+class OpeningTracker(object):
+
+    """Follow the played moves through the eco trie - a constant cost per pushed/popped move."""
+
+    def __init__(self, root=None):
+        super(OpeningTracker, self).__init__()
+        self.root = root
+        self.path = []
+        self.reset()
+
+    def reset(self):
+        self.path = [(self.root, None)]  # (trie node or None if left, longest opening so far)
+
+    def push(self, san: str):
+        node, entry = self.path[-1]
+        node = node.children.get(san_key(san)) if node else None
+        if node and node.entry:
+            entry = node.entry
+        self.path.append((node, entry))
+
+    def pop(self):
+        if len(self.path) > 1:
+            self.path.pop()
+
+    def opening(self):
+        """Return the longest opening (name, moves, eco) matching the played moves or None."""
+        return self.path[-1][1]
+
+
+def build_fen_index(lines):
+    """Build the dict board placement => opening name of the fen file (a fen line followed by its name line)."""
+    lines = list(lines)
+    index = {}
+    for line_no, line in enumerate(lines[:-1]):
+        fields = line.split()
+        if fields and fields[0].count('/') == 7:
+            index.setdefault(fields[0], lines[line_no + 1])  # the first of same placements wins
+    return index
+
+
+def fen_index(source='opening_name_fen.txt'):
+    """Return the (shared) placement => opening name dict of the source file."""
+    return _load_index(source, 'fen', build_fen_index)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2013-2019 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#                         Molli (and thanks to Martin  for his opening
+#                         identification code)
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import chess
+
+MATE_SCORE = 999  # score (in pawns) of a mate like the tutor uses it
+
+
+class EvalTable(object):
+
+    """Analysis lines (pv key, move, score, mate) sorted by score - best line first - with a move index."""
+
+    def __init__(self, lines: list):
+        super(EvalTable, self).__init__()
+        self.lines = sorted(lines, key=lambda line: line[2], reverse=True)  # stable like before
+        self.rows = {}  # move => first row
+        for row, line in enumerate(self.lines):
+            self.rows.setdefault(line[1], row)
+
+    @classmethod
+    def from_lines(cls, pv_lines: dict, score_lines: dict):
+        """Build the table of the pv & score dicts of an info handler (lines without score are left out)."""
+        lines = []
+        for pv_key, pv in pv_lines.items():
+            score_val = score_lines.get(pv_key)
+            if not score_val:
+                continue
+            score = score_val.cp / 100 if score_val.cp else 0
+            mate = int(score_val.mate) if score_val.mate else 0
+            if mate:
+                score = MATE_SCORE if mate > 0 else -MATE_SCORE
+            lines.append((pv_key, pv[0] if pv else chess.Move.null(), score, mate))
+        return cls(lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def row(self, index: int):
+        """Return the line as tuple (pv key, move, score, mate) like the tutor lists use it."""
+        return self.lines[index]
+
+    def to_list(self):
+        """Return the lines - the list itself, not a copy."""
+        return self.lines
+
+    def find(self, move: chess.Move):
+        """Return the row of the move or None."""
+        return self.rows.get(move)
+
+    def alternatives(self, threshold: float):
+        """Return the moves scored within threshold of the best one (best first)."""
+        if not self.lines:
+            return []
+        best = self.lines[0][2]
+        return [move for (_, move, score, _) in self.lines if move and abs(best - score) <= threshold]
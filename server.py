@@ -36,6 +36,7 @@ from dgt.util import PlayMode, Mode, ClockSide
 from dgt.iface import DgtIface
 from dgt.translate import DgtTranslate
 from dgt.board import DgtBoard
+from uci.ponder import ponder_stats
 
 # This needs to be reworked to be session based (probably by token)
 # Otherwise multiple clients behind a NAT can all play as the 'player'
@@ -150,6 +151,8 @@ class InfoHandler(ServerRequestHandler):
         if action == 'get_clock_text':
             if 'clock_text' in self.shared:
                 self.write(self.shared['clock_text'])
+        if action == 'get_ponder_stats':
+            self.write({'ponder_stats': ponder_stats.report()})
 
 
 class ChessBoardHandler(ServerRequestHandler):
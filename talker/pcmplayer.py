@@ -0,0 +1,193 @@
+# Copyright (C) 2013-2018 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# In-process playback of the voice files: decoded once (libsndfile) into PCM, played by one
+# audio stream (portaudio). Without both libs PicoTalker stays with sox "play".
+# To install them use:
+# sudo apt install libsndfile1 libportaudio2 && pip3 install soundfile sounddevice
+
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    import soundfile
+    import sounddevice
+except (ImportError, OSError):  # OSError: python module there, but the C library missing
+    soundfile = None
+    sounddevice = None
+
+PLAY_ERRORS = (OSError, RuntimeError, ValueError) + ((sounddevice.PortAudioError,) if sounddevice else ())
+
+PCM_CACHE_BYTES = 48 * 1024 * 1024  # ~9min of 44.1kHz mono speech (voice files & utterances)
+TEMPO_FRAME = 1024  # samples of a tempo (wsola) frame - ~23ms at 44.1kHz
+TEMPO_SEARCH = 256  # max samples a frame is shifted to fit the previous one
+PLAY_CHUNKS_PER_SEC = 10  # a cancelled utterance stops within 1/10s
+
+
+def time_stretch(samples: np.ndarray, factor: float, frame=TEMPO_FRAME, search=TEMPO_SEARCH):
+    """Change the tempo by factor (>1 faster) keeping the pitch - like sox "tempo" (wsola)."""
+    if abs(factor - 1.0) < 0.01 or len(samples) < 2 * frame:
+        return samples
+    hop = frame // 2
+    window = np.hanning(frame).astype(np.float32)
+    data = np.concatenate([samples.astype(np.float32), np.zeros(2 * frame + search, dtype=np.float32)])
+    out_len = int(len(samples) / factor)
+    out = np.zeros(out_len + frame, dtype=np.float32)
+    norm = np.zeros(out_len + frame, dtype=np.float32)
+    expected = None  # natural continuation of the last frame
+    out_pos = 0
+    while out_pos < out_len:
+        nominal = int(out_pos * factor)
+        if expected is None:
+            start = nominal
+        else:
+            low = max(0, nominal - search)
+            corr = np.correlate(data[low:nominal + search + frame], expected, mode='valid')
+            start = low + int(np.argmax(corr))
+        out[out_pos:out_pos + frame] += data[start:start + frame] * window
+        norm[out_pos:out_pos + frame] += window
+        expected = data[start + hop:start + hop + frame]
+        out_pos += hop
+    norm[norm < 1e-3] = 1.0
+    out = out[:out_len] / norm[:out_len]
+    return np.clip(out, -32768, 32767).astype(np.int16)
+
+
+class PcmCache(object):
+
+    """Decoded voice files & rendered utterances - least recently used ones dropped above max_bytes.
+
+    An utterance (all parts of an announcement) is concatenated and tempo adjusted as a whole once
+    per speed factor, the next time it only costs a dict lookup.
+    """
+
+    def __init__(self, max_bytes=PCM_CACHE_BYTES):
+        super(PcmCache, self).__init__()
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.entries = OrderedDict()  # file or (files, speed factor) => (int16 samples, sample rate)
+        self.lock = threading.Lock()
+
+    def _lookup(self, key, build):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+        entry = build()
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = entry
+                self.used_bytes += entry[0].nbytes
+            while self.used_bytes > self.max_bytes and len(self.entries) > 1:
+                _, (old_samples, _) = self.entries.popitem(last=False)
+                self.used_bytes -= old_samples.nbytes
+        return entry
+
+    def get(self, voice_file: str):
+        """Return (samples, rate) of the voice file - decoded only the first time."""
+        def decode():
+            samples, rate = soundfile.read(voice_file, dtype='int16')
+            if samples.ndim > 1:  # the voices are mono, but just in case
+                samples = samples.mean(axis=1).astype(np.int16)
+            return samples, rate
+        return self._lookup(voice_file, decode)
+
+    def utterance(self, voice_files: list, speed_factor: float):
+        """Return (samples, rate) of the voice files played one after the other at speed factor."""
+        def render():
+            parts = [self.get(voice_file) for voice_file in voice_files]
+            rate = parts[0][1]
+            if any(part_rate != rate for _, part_rate in parts):
+                logging.warning('voice files with different sample rates - some are skipped')
+            samples = np.concatenate([part for part, part_rate in parts if part_rate == rate])
+            return time_stretch(samples, speed_factor), rate
+        return self._lookup((tuple(voice_files), round(speed_factor, 2)), render)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.used_bytes = 0
+
+
+pcm_cache = PcmCache()  # shared by the user & computer voice
+
+
+class PcmPlayer(object):
+
+    """Play voice files gapless as one block through an audio stream kept open."""
+
+    def __init__(self, cache=pcm_cache):
+        super(PcmPlayer, self).__init__()
+        self.cache = cache
+        self.stream = None
+        self.rate = None
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def available():
+        """Return if the soundfile & sounddevice libs are installed."""
+        return soundfile is not None and sounddevice is not None
+
+    def play(self, voice_files: list, speed_factor: float, cancel=None):
+        """Play the voice files (blocking) - stops early once the cancel event is set.
+
+        Raises one of PLAY_ERRORS if decoding or the audio device fails.
+        """
+        if not voice_files:
+            return
+        samples, rate = self.cache.utterance(voice_files, speed_factor)
+        samples = samples.reshape(-1, 1)
+        chunk = rate // PLAY_CHUNKS_PER_SEC
+        with self.lock:
+            stream = self._stream(rate)
+            for pos in range(0, len(samples), chunk):
+                if cancel is not None and cancel.is_set():
+                    break
+                stream.write(samples[pos:pos + chunk])
+
+    def render(self, voice_files: list, speed_factor: float):
+        """Render the utterance into the cache without playing it."""
+        if voice_files:
+            self.cache.utterance(voice_files, speed_factor)
+
+    def _stream(self, rate: int):
+        """Return the open output stream for the sample rate (needs the lock)."""
+        if self.stream is not None and self.rate != rate:
+            self._close()
+        if self.stream is None:
+            self.stream = sounddevice.OutputStream(samplerate=rate, channels=1, dtype='int16')
+            self.stream.start()
+            self.rate = rate
+        return self.stream
+
+    def _close(self):
+        try:
+            self.stream.close()
+        except PLAY_ERRORS:
+            pass
+        self.stream = None
+        self.rate = None
+
+    def close(self):
+        """Close the audio stream."""
+        with self.lock:
+            if self.stream is not None:
+                self._close()
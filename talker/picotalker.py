@@ -28,6 +28,9 @@ import threading
 import logging
 import subprocess
 import queue
+import hashlib
+import heapq
+import tempfile
 from pathlib import Path
 from shutil import which
 #molli
@@ -38,11 +41,56 @@ from utilities import DisplayMsg
 from timecontrol import TimeControl
 from dgt.api import Message
 from dgt.util import GameResult, PlayMode, Voice
+from talker.pcmplayer import PcmPlayer, PLAY_ERRORS
 
 import os
 ##molli
 import time
 
+UTTERANCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')  # utterances rendered by sox
+UTTERANCE_DIR_BYTES = 64 * 1024 * 1024  # least recently used utterances are deleted above
+SPEECH_URGENT = 0  # system messages: errors, game results, menu confirmations
+SPEECH_MOVE = 1  # the move announcements
+SPEECH_COMMENT = 2  # voice comments & chat
+SPEECH_MAX_LAG = {SPEECH_URGENT: None, SPEECH_MOVE: 5.0, SPEECH_COMMENT: 2.0}  # max secs speech waits, else dropped
+
+
+def prune_utterances(max_bytes=UTTERANCE_DIR_BYTES):
+    """Delete the least recently used rendered utterances until the cache dir is below max_bytes."""
+    try:
+        entries = [entry for entry in os.scandir(UTTERANCE_DIR) if entry.name.endswith('.wav')]
+        stats = sorted(((entry.stat(), entry.path) for entry in entries), key=lambda item: item[0].st_mtime)
+    except OSError as os_exc:
+        logging.debug('utterance cache not readable: %s', os_exc)
+        return
+    used_bytes = sum(stat.st_size for stat, _ in stats)
+    for stat, path in stats:
+        if used_bytes <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            used_bytes -= stat.st_size
+        except OSError:
+            pass
+
+
+def popular_utterances():
+    """Return the announcements rendered at startup: opening pawn & minor piece moves, castling, tutor verdicts."""
+    utterances = [['castlekingside.ogg'], ['castlequeenside.ogg'], ['check.ogg'], ['newgame.ogg'], ['ok.ogg'],
+                  ['takeback.ogg']]
+    for file in 'abcdefgh':
+        for rank in '3456':
+            utterances.append([file + '.ogg', rank + '.ogg'])
+    for piece, squares in (('knight.ogg', ['c3', 'f3', 'd2', 'e2', 'c6', 'f6', 'd7', 'e7']),
+                           ('bishop.ogg', ['b5', 'c4', 'd3', 'e2', 'g5', 'b4', 'c5', 'd6', 'e7', 'g4'])):
+        for square in squares:
+            utterances.append([piece, square[0] + '.ogg', square[1] + '.ogg'])
+    for verdict in ['verybadmove.ogg', 'badmove.ogg', 'dubiousmove.ogg', 'interestingmove.ogg', 'goodmove.ogg',
+                    'verygoodmove.ogg']:
+        utterances.append(['picotutor_notify.ogg', verdict])
+    return utterances
+
+
 class PicoTalker(object):
 
     """Handle the human speaking of events."""
@@ -50,7 +98,8 @@ class PicoTalker(object):
     def __init__(self, localisation_id_voice, speed_factor: float):
         self.voice_path = None
         self.speed_factor = 1.0
-        self.set_speed_factor(speed_factor)
+        self.player = PcmPlayer() if PcmPlayer.available() else None  # None => sox "play"
+        self.prebuild_generation = 0
         self.sound = None
         try:
             (localisation_id, voice_name) = localisation_id_voice.split(':')
@@ -61,33 +110,164 @@ class PicoTalker(object):
                 logging.warning('voice path [%s] doesnt exist', voice_path)
         except ValueError:
             logging.warning('not valid voice parameter')
+        self.set_speed_factor(speed_factor)
 
     def set_speed_factor(self, speed_factor: float):
-        """Set the speed voice factor."""
-        self.speed_factor = speed_factor if which('play') else 1.0  # check for "sox" package
+        """Set the speed voice factor (and render the popular utterances for it in the background)."""
+        self.speed_factor = speed_factor if self.player or which('play') else 1.0  # check for "sox" package
+        if self.voice_path:
+            self.prebuild(popular_utterances())
+
+    def voice_files(self, sounds, warn=True):
+        """Return the existing voice files of the sound parts."""
+        voice_files = []
+        for part in sounds:
+            voice_file = self.voice_path + '/' + part
+            if Path(voice_file).is_file():
+                voice_files.append(voice_file)
+            elif warn:
+                logging.warning('voice file not found %s', voice_file)
+        return voice_files
+
+    def prebuild(self, utterances: list):
+        """Render the utterances (at the current speed factor) in a background thread."""
+        self.prebuild_generation += 1
+        threading.Thread(target=self._prebuild, args=(utterances, self.prebuild_generation), daemon=True).start()
+
+    def _prebuild(self, utterances: list, generation: int):
+        start = time.time()
+        for sounds in utterances:
+            if generation != self.prebuild_generation:  # speed factor changed meanwhile
+                return
+            voice_files = self.voice_files(sounds, warn=False)
+            try:
+                if self.player:
+                    self.player.render(voice_files, self.speed_factor)
+                elif len(voice_files) > 1 and which('sox'):
+                    self.sox_render(voice_files)
+            except PLAY_ERRORS as render_exc:
+                logging.warning('prebuild of utterances failed: %s', render_exc)
+                return
+        logging.debug('%s utterances prebuilt in %.1fs', len(utterances), time.time() - start)
 
-    def talk(self, sounds):
-        """Speak out the sound part by using sox play."""
+    def sox_render(self, voice_files: list):
+        """Return the wav file of the voice files at speed factor - rendered by sox once, None if that fails."""
+        key = repr((voice_files, round(self.speed_factor, 2))).encode()
+        cache_file = os.path.join(UTTERANCE_DIR, hashlib.sha1(key).hexdigest() + '.wav')
+        if Path(cache_file).is_file():
+            try:
+                os.utime(cache_file)  # the modification time tells when it was used last
+            except OSError:
+                pass
+            return cache_file
+        try:
+            os.makedirs(UTTERANCE_DIR, exist_ok=True)
+            handle, tmp_file = tempfile.mkstemp(suffix='.wav', dir=UTTERANCE_DIR)
+            os.close(handle)
+            command = ['sox'] + voice_files + [tmp_file, 'tempo', str(self.speed_factor)]
+            if subprocess.call(command, shell=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE):
+                os.remove(tmp_file)
+                return None
+            os.replace(tmp_file, cache_file)
+        except OSError as os_exc:
+            logging.debug('sox render failed: %s', os_exc)
+            return None
+        prune_utterances()
+        return cache_file
+
+    def talk(self, sounds, cancel=None):
+        """Speak out the sound parts - in-process (if possible) or by using sox play.
+
+        Setting the cancel event (threading.Event) stops the speech early.
+        """
         if not self.voice_path:
             logging.debug('picotalker turned off')
             return False
 
-        vpath = self.voice_path
-        result = False
-        for part in sounds:
-            voice_file = vpath + '/' + part
-            if Path(voice_file).is_file():
-                command = ['play', voice_file, 'tempo', str(self.speed_factor)]
-                try:  # use blocking call
-                    subprocess.call(command, shell=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    result = True
-                except OSError as os_exc:
-                    logging.warning('OSError: %s => turn voice OFF', os_exc)
-                    self.voice_path = None
-                    return False
-            else:
-                logging.warning('voice file not found %s', voice_file)
-        return result
+        voice_files = self.voice_files(sounds)
+        if self.player:
+            try:
+                self.player.play(voice_files, self.speed_factor, cancel)
+                return bool(voice_files)
+            except PLAY_ERRORS as play_exc:
+                logging.warning('in-process audio failed: %s => use sox play', play_exc)
+                self.player.close()
+                self.player = None
+
+        ## several parts: play the whole utterance at once (rendered only the first time)
+        rendered = self.sox_render(voice_files) if len(voice_files) > 1 else None
+        if rendered:
+            commands = [['play', rendered]]
+        else:
+            commands = [['play', voice_file, 'tempo', str(self.speed_factor)] for voice_file in voice_files]
+        for command in commands:
+            if cancel is not None and cancel.is_set():
+                break
+            try:  # blocking, but stopped once cancelled
+                process = subprocess.Popen(command, shell=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            except OSError as os_exc:
+                logging.warning('OSError: %s => turn voice OFF', os_exc)
+                self.voice_path = None
+                return False
+            if cancel is None:
+                process.wait()
+            while process.poll() is None:
+                if cancel.wait(0.05):
+                    process.terminate()
+                    process.wait()
+        return bool(voice_files)
+
+
+class SpeechQueue(object):
+
+    """Speech waiting to be spoken - superseded or too late speech gets dropped.
+
+    Urgent speech goes first, all other speech is spoken in the order it was queued for its position.
+    """
+
+    def __init__(self):
+        super(SpeechQueue, self).__init__()
+        self.heap = []  # ((urgent first, position, seq), priority, queued time, dev, sounds)
+        self.seq = 0
+        self.position = 0  # increased with every superseding position
+        self.current = None  # the speech spoken right now
+        self.cancel = threading.Event()  # set => stop the current speech
+        self.condition = threading.Condition()
+
+    def put(self, sounds: list, dev: str, priority: int):
+        with self.condition:
+            self.seq += 1
+            order = (0 if priority == SPEECH_URGENT else 1, self.position, self.seq)
+            heapq.heappush(self.heap, (order, priority, time.monotonic(), dev, sounds))
+            if priority == SPEECH_URGENT and self.current and self.current[1] == SPEECH_COMMENT:
+                self.cancel.set()
+            self.condition.notify()
+
+    def supersede(self):
+        """The position changed: drop the queued speech (not the urgent one) & stop a running comment."""
+        with self.condition:
+            self.position += 1
+            self.heap = [speech for speech in self.heap if speech[1] == SPEECH_URGENT]
+            heapq.heapify(self.heap)
+            if self.current and self.current[1] == SPEECH_COMMENT:
+                self.cancel.set()
+
+    def get(self):
+        """Wait for the next speech (order, priority, queued time, dev, sounds) not too late."""
+        with self.condition:
+            self.current = None
+            while True:
+                while not self.heap:
+                    self.condition.wait()
+                speech = heapq.heappop(self.heap)
+                max_lag = SPEECH_MAX_LAG[speech[1]]
+                if max_lag is not None and time.monotonic() - speech[2] > max_lag:
+                    logging.debug('speech %s too late - dropped', speech[4])
+                    continue
+                self.current = speech
+                self.cancel.clear()
+                return speech
+
 
 class PicoTalkerDisplay(DisplayMsg, threading.Thread):
 
@@ -157,6 +337,7 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
         self.c_no_pawn       = 0
 
         self.c_comment_factor = comment_factor
+        self.speech = SpeechQueue()
 
         if user_voice:
             logging.debug('creating user voice: [%s]', str(user_voice))
@@ -223,23 +404,38 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
         if self.user_picotalker:
             self.user_picotalker.set_speed_factor(speed_factor)
 
-    def talk(self, sounds, dev=SYSTEM):
-        if self.low_time:
+    def talk(self, sounds, dev=SYSTEM, priority=None):
+        """Queue the sounds for the speaker thread (moves of user/computer as SPEECH_MOVE, else SPEECH_URGENT)."""
+        if self.low_time or not sounds:
             return
+        if priority is None:
+            priority = SPEECH_MOVE if dev in (self.USER, self.COMPUTER) else SPEECH_URGENT
+        self.speech.put(list(sounds), dev, priority)
+
+    def speak(self, sounds, dev):
+        cancel = self.speech.cancel
         if False:  # switch-case
             pass
         elif dev == self.USER:
             if self.user_picotalker:
-                self.user_picotalker.talk(sounds)
+                self.user_picotalker.talk(sounds, cancel)
         elif dev == self.COMPUTER:
             if self.computer_picotalker:
-                self.computer_picotalker.talk(sounds)
+                self.computer_picotalker.talk(sounds, cancel)
         elif dev == self.SYSTEM:
             if self.computer_picotalker:
-                self.computer_picotalker.talk(sounds)
+                self.computer_picotalker.talk(sounds, cancel)
                 return
             if self.user_picotalker:
-                self.user_picotalker.talk(sounds)
+                self.user_picotalker.talk(sounds, cancel)
+
+    def speaker(self):
+        """Speak the queued speech - the message loop never waits for it."""
+        while True:
+            _, priority, _, dev, sounds = self.speech.get()
+            if self.low_time and priority != SPEECH_URGENT:
+                continue
+            self.speak(sounds, dev)
 
     def get_total_cgroup(self, c_group: str):
     ## molli: define number of possible comments in differrent event groups
@@ -382,10 +578,11 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
 
         return talkfile
 
-    def comment(self, c_group):
+    def comment(self, c_group, priority=SPEECH_COMMENT):
         ## molli: define number of possible comments in differrent event groups
         ##        together with a probability factor one can control how
         ##        often a group comment will be spoke
+        ##        (a comment before a move is spoken as part of the move: priority SPEECH_MOVE)
         talkfile = ''
 
         ## get total numbers of possible comments for this event group in dependence of
@@ -394,7 +591,7 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
         talkfile = self.calc_comment(c_group)
 
         if talkfile != '':
-            self.talk([talkfile])
+            self.talk([talkfile], priority=priority)
 
     def move_comment(self):
         talkfile = ''
@@ -421,7 +618,7 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
             talkfile = self.calc_comment('pawn')
 
         if talkfile != '':
-            self.talk([talkfile])
+            self.talk([talkfile], priority=SPEECH_COMMENT)
 
         if PicoTalkerDisplay.c_mate:
             talkfile = ''
@@ -435,7 +632,7 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
             talkfile = ''
 
         if talkfile != '':
-            self.talk([talkfile])
+            self.talk([talkfile], priority=SPEECH_COMMENT)
 
     def say_squarepiece(self, fen_result):
         logging.debug('molli: talker fen_result = %s', fen_result)
@@ -522,6 +719,7 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
 
         previous_move = chess.Move.null()  # Ignore repeated broadcasts of a move
         last_pos_dir = ''
+        threading.Thread(target=self.speaker, name='speaker', daemon=True).start()
         logging.info('msg_queue ready')
         while True:
             try:
@@ -538,6 +736,7 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
                     last_pos_dir = ''
                     if message.newgame:
                         logging.debug('announcing START_NEW_GAME')
+                        self.speech.supersede()
                         self.talk(['newgame.ogg'])
                         self.play_game = None
                         self.comment('newgame') ##molli
@@ -552,8 +751,9 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
                             previous_move = chess.Move.null() ## molli
                         if message.move != previous_move:
                             logging.debug('announcing COMPUTER_MOVE [%s]', message.move)
+                            self.speech.supersede()
                             game_copy.push(message.move)
-                            self.comment('beforecmove') ##molli
+                            self.comment('beforecmove', SPEECH_MOVE) ##molli
                             self.talk(self.say_last_move(game_copy), self.COMPUTER)
                             self.move_comment() ##molli
                             self.comment('cmove') ##molli
@@ -567,7 +767,8 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
                 elif isinstance(message, Message.USER_MOVE_DONE):
                     if message.move and message.game and message.move != previous_move:
                         logging.debug('announcing USER_MOVE_DONE [%s]', message.move)
-                        self.comment('beforeumove') ##molli
+                        self.speech.supersede()
+                        self.comment('beforeumove', SPEECH_MOVE) ##molli
                         self.talk(self.say_last_move(message.game), self.USER)
                         previous_move = message.move
                         self.play_game = None
@@ -578,6 +779,7 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
                 elif isinstance(message, Message.REVIEW_MOVE_DONE):
                     if message.move and message.game and message.move != previous_move:
                         logging.debug('announcing REVIEW_MOVE_DONE [%s]', message.move)
+                        self.speech.supersede()
                         self.talk(self.say_last_move(message.game), self.USER)
                         previous_move = message.move
                         self.play_game = None  # @todo why thats not set in dgtdisplay?
@@ -610,16 +812,14 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
                         if message.game.turn == chess.BLACK:
                             # white wins
                             if self.play_mode == PlayMode.USER_WHITE:
-                                self.talk(['checkmate.ogg'])
-                                self.talk(['whitewins.ogg']) #molli
+                                self.talk(['checkmate.ogg', 'whitewins.ogg']) #molli
                                 self.comment('uwin') ##molli
                             else:
                                 self.comment('uloose') ##molli
                         else:
                             # black wins
                             if self.play_mode == PlayMode.USER_BLACK:
-                                self.talk(['checkmate.ogg'])
-                                self.talk(['blackwins.ogg']) #molli
+                                self.talk(['checkmate.ogg', 'blackwins.ogg']) #molli
                                 self.comment('uwin') ##molli
                             else:
                                 self.comment('uloose') ##molli
@@ -655,6 +855,7 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
 
                 elif isinstance(message, Message.TAKE_BACK):
                     logging.debug('announcing TAKE_BACK')
+                    self.speech.supersede()
                     self.talk(['takeback.ogg'])
                     self.play_game = None
                     previous_move = chess.Move.null()
@@ -770,70 +971,57 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
                         last_pos_dir = message.fen_result
                         if 'clear' in message.fen_result:
                             fen_str = message.fen_result[-2:]
-                            self.talk(['remove.ogg'])
-                            self.talk(self.say_squarepiece(fen_str))
+                            self.talk(['remove.ogg'] + self.say_squarepiece(fen_str))
                         elif 'put' in message.fen_result:
                             fen_str = message.fen_result[-4:]
-                            self.talk(['put.ogg'])
-                            self.talk(self.say_squarepiece(fen_str))
+                            self.talk(['put.ogg'] + self.say_squarepiece(fen_str))
                         else:
                             pass
 
                 elif isinstance(message, Message.PICOTUTOR_MSG): ##molli picotutor
+                    ## verdicts, hints & scores belong to the move (in its order) - not urgent like system messages
                     if '??' == message.eval_str:
-                        self.talk(['picotutor_notify.ogg'])
-                        self.talk(['verybadmove.ogg'])
+                        self.talk(['picotutor_notify.ogg', 'verybadmove.ogg'], priority=SPEECH_MOVE)
                     elif '?' == message.eval_str:
-                        self.talk(['picotutor_notify.ogg'])
-                        self.talk(['badmove.ogg'])
+                        self.talk(['picotutor_notify.ogg', 'badmove.ogg'], priority=SPEECH_MOVE)
                     elif '!?' == message.eval_str:
-                        self.talk(['picotutor_notify.ogg'])
-                        self.talk(['interestingmove.ogg'])
+                        self.talk(['picotutor_notify.ogg', 'interestingmove.ogg'], priority=SPEECH_MOVE)
                     elif '!!' == message.eval_str:
-                        self.talk(['picotutor_notify.ogg'])
-                        self.talk(['verygoodmove.ogg'])
+                        self.talk(['picotutor_notify.ogg', 'verygoodmove.ogg'], priority=SPEECH_MOVE)
                     elif '!' == message.eval_str:
-                        self.talk(['picotutor_notify.ogg'])
-                        self.talk(['goodmove.ogg'])
+                        self.talk(['picotutor_notify.ogg', 'goodmove.ogg'], priority=SPEECH_MOVE)
                     elif '?!' == message.eval_str:
-                        self.talk(['picotutor_notify.ogg'])
-                        self.talk(['dubiousmove.ogg'])
+                        self.talk(['picotutor_notify.ogg', 'dubiousmove.ogg'], priority=SPEECH_MOVE)
                     elif 'ER' == message.eval_str:
-                        self.talk(['picotutor_notify.ogg'])
-                        self.talk(['error.ogg'])
+                        self.talk(['picotutor_notify.ogg', 'error.ogg'])
                     elif 'ACTIVE' in message.eval_str:
-                        self.talk(['picotutor_notify.ogg'])
-                        self.talk(['picotutor_enabled.ogg'])
+                        self.talk(['picotutor_notify.ogg', 'picotutor_enabled.ogg'])
                     elif 'ANALYSIS' in message.eval_str:
-                        self.talk(['picotutor_notify.ogg'])
-                        self.talk(['picotutor_analysis.ogg'])
+                        self.talk(['picotutor_notify.ogg', 'picotutor_analysis.ogg'])
                     elif 'HINT' in message.eval_str:
-                        self.talk(['picotutor_hintmove.ogg'])
-                        self.talk(self.say_tutor_move(message.game))
+                        self.talk(['picotutor_hintmove.ogg'] + self.say_tutor_move(message.game), priority=SPEECH_MOVE)
                     elif 'THREAT' in message.eval_str:
-                        self.talk(['picotutor_threatmove.ogg'])
-                        self.talk(self.say_tutor_move(message.game))
+                        self.talk(['picotutor_threatmove.ogg'] + self.say_tutor_move(message.game), priority=SPEECH_MOVE)
                     elif 'POSOK' in message.eval_str:
                         last_pos_dir = ''
                         self.talk(['ok.ogg'])
                     elif 'POS' in message.eval_str:
                         score = message.score
                         if abs(score) <= 1:
-                            self.talk(['picotutor_equal_position.ogg'])
+                            self.talk(['picotutor_equal_position.ogg'], priority=SPEECH_MOVE)
                         elif score > 3:
-                            self.talk(['picotutor_verygood_position.ogg'])
+                            self.talk(['picotutor_verygood_position.ogg'], priority=SPEECH_MOVE)
                         elif score > 1 and score < 3:
-                            self.talk(['picotutor_good_position.ogg'])
+                            self.talk(['picotutor_good_position.ogg'], priority=SPEECH_MOVE)
                         elif score < -3:
-                            self.talk(['picotutor_verybad_position.ogg'])
+                            self.talk(['picotutor_verybad_position.ogg'], priority=SPEECH_MOVE)
                         elif score > -3 and score < -1:
-                            self.talk(['picotutor_bad_position.ogg'])
+                            self.talk(['picotutor_bad_position.ogg'], priority=SPEECH_MOVE)
                     elif 'BEST' in message.eval_str:
-                        self.talk(['picotutor_best_move.ogg'])
-                        self.talk(self.say_tutor_move(message.game))
+                        self.talk(['picotutor_best_move.ogg'] + self.say_tutor_move(message.game), priority=SPEECH_MOVE)
                     elif 'PICMATE' in message.eval_str:
                         logging.debug('molli in picotutortalker: %s', message.eval_str)
-                        self.talk(['picotutor_pico_mate.ogg'])
+                        self.talk(['picotutor_pico_mate.ogg'], priority=SPEECH_MOVE)
                         list_str = message.eval_str
                         list_mate = list_str.split('_')
                         logging.debug('molli in picotutortalker: %s', list_mate[0])
@@ -841,10 +1029,10 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
 
                         talk_mate = 't_' + list_mate[1] + '.ogg'
                         logging.debug('talk_mate = %s', talk_mate)
-                        self.talk([talk_mate])
+                        self.talk([talk_mate], priority=SPEECH_MOVE)
                     elif 'USRMATE' in message.eval_str:
                         logging.debug('molli in picotutortalker: %s', message.eval_str)
-                        self.talk(['picotutor_player_mate.ogg'])
+                        self.talk(['picotutor_player_mate.ogg'], priority=SPEECH_MOVE)
                         list_str = message.eval_str
                         list_mate = list_str.split('_')
                         logging.debug('molli in picotutortalker: %s', list_mate[0])
@@ -852,7 +1040,7 @@ class PicoTalkerDisplay(DisplayMsg, threading.Thread):
 
                         talk_mate = 't_' + list_mate[1] + '.ogg'
                         logging.debug('talk_mate = %s', talk_mate)
-                        self.talk([talk_mate])
+                        self.talk([talk_mate], priority=SPEECH_MOVE)
 
                 elif isinstance(message, Message.PGN_GAME_END): ##molli for pgn replay
                     logging.debug('announcing PGN GAME END')
@@ -19,6 +19,7 @@ import time
 import threading
 import logging
 import copy
+from collections import deque
 from math import floor
 from math import ceil ##molli for online
 
@@ -28,6 +29,49 @@ from dgt.api import Event
 from dgt.util import TimeMode
 
 
+MOVE_OVERHEAD_SAMPLES = 20  # rolling window of measurements per engine & board
+MOVE_OVERHEAD_MIN_SAMPLES = 3
+MOVE_OVERHEAD_MAX = 300  # ms - more than this is a hiccup (swapping, gc) not the normal latency
+
+
+class MoveOverhead(object):
+
+    """Rolling statistics of the time from the engine bestmove until picochess stops the engine clock."""
+
+    def __init__(self, samples=MOVE_OVERHEAD_SAMPLES):
+        super(MoveOverhead, self).__init__()
+        self.samples = {}  # (engine name, board type) => deque of ms values
+        self.size = samples
+        self.lock = threading.Lock()
+
+    def add(self, engine_name: str, board_type: str, seconds: float):
+        """Add a measurement."""
+        value = min(MOVE_OVERHEAD_MAX, max(0, int(seconds * 1000)))
+        with self.lock:
+            window = self.samples.setdefault((engine_name, board_type), deque(maxlen=self.size))
+            window.append(value)
+        logging.debug('move overhead [%s/%s]: %sms', engine_name, board_type, value)
+
+    def get(self, engine_name: str, board_type: str):
+        """Return the overhead (median in ms) or 0 if not enough measurements."""
+        with self.lock:
+            window = sorted(self.samples.get((engine_name, board_type), []))
+        if len(window) < MOVE_OVERHEAD_MIN_SAMPLES:
+            return 0
+        return window[len(window) // 2]
+
+    def stats(self):
+        """Return count/median/mean/max for each engine & board."""
+        result = {}
+        with self.lock:
+            items = [(key, sorted(window)) for key, window in self.samples.items()]
+        for key, window in items:
+            if window:
+                result[key] = {'count': len(window), 'median': window[len(window) // 2],
+                               'mean': int(sum(window) / len(window)), 'max': window[-1]}
+        return result
+
+
 class TimeControl(object):
 
     """Control the picochess internal clock."""
@@ -279,15 +323,22 @@ class TimeControl(object):
         """Return if the internal clock is running."""
         return self.active_color is not None
 
-    def uci(self):
-        """Return remaining time for both players in an UCI dict."""
+    def uci(self, overhead=0):
+        """Return remaining time for both players in an UCI dict.
+
+        The overhead (ms) is subtracted from the game times for engines without a "Move Overhead" option.
+        """
+        def _game_time(color):
+            game_time = int(self.internal_time[color] * 1000)
+            return str(max(min(game_time, 100), game_time - overhead))
+
         uci_dict = {}
         if self.depth > 0: ##molli depth
             uci_dict['depth'] = str(self.depth)
         
         elif self.mode in (TimeMode.BLITZ, TimeMode.FISCHER):
-            uci_dict['wtime'] = str(int(self.internal_time[chess.WHITE] * 1000))
-            uci_dict['btime'] = str(int(self.internal_time[chess.BLACK] * 1000))
+            uci_dict['wtime'] = _game_time(chess.WHITE)
+            uci_dict['btime'] = _game_time(chess.BLACK)
             
             if self.mode == TimeMode.FISCHER:
                 uci_dict['winc'] = str(self.fisch_inc * 1000)
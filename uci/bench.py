@@ -0,0 +1,190 @@
+# Copyright (C) 2013-2018 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import logging
+import platform
+import time
+
+import chess
+import chess.uci
+from uci.engine import UciShell, UciEngine
+from uci.read import read_engine_ini
+
+# a fixed set of positions (opening, middlegame, tactics, endgame) so results can be compared between runs
+BENCH_POSITIONS = [
+    chess.STARTING_FEN,
+    'r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4',
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'r1b2rk1/2q1bppp/p2p1n2/np2p3/3PP3/5N1P/PPBN1PP1/R1BQR1K1 w - - 0 13',
+    '2r3k1/pp3ppp/4p3/3pP3/3P4/P3Q3/1q3PPP/2R3K1 b - - 0 25',
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+    '8/8/4k3/8/2p5/8/B2K4/8 w - - 0 1',
+]
+BENCH_THREADS = 1  # default option set of a benchmark run - the same for all engines
+BENCH_HASH = 64
+
+
+def is_benchmark_engine(eng: dict):
+    """Check if an engines.ini entry is a local uci engine which can be benchmarked."""
+    name = eng['name']
+    file = eng['file']
+    if '(mame' in name or '(mess' in name or name.startswith('Online'):
+        return False  # emulation & online engines dont search in a comparable way
+    return 'pgn_' not in file and 'remote' not in file
+
+
+def read_rss(pid: int):
+    """Return the resident set size (in KB) of a local process or 0 if unknown."""
+    try:
+        with open('/proc/{}/status'.format(pid), 'r') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+class BenchHandler(chess.uci.InfoHandler):
+
+    """Collect the search statistics needed for the benchmark."""
+
+    def __init__(self):
+        super(BenchHandler, self).__init__()
+        self.max_nodes = 0
+        self.max_nps = 0
+
+    def on_go(self):
+        """Engine sends GO."""
+        self.max_nodes = 0
+        self.max_nps = 0
+        super().on_go()
+
+    def nodes(self, x):
+        """Engine sends NODES."""
+        self.max_nodes = max(self.max_nodes, x)
+        super().nodes(x)
+
+    def nps(self, x):
+        """Engine sends NPS."""
+        self.max_nps = max(self.max_nps, x)
+        super().nps(x)
+
+
+class EngineBenchmark(object):
+
+    """Run the installed engines through a fixed set of positions."""
+
+    def __init__(self, engine_path=None, depth=12, threads=None, hash_size=None, positions=None):
+        super(EngineBenchmark, self).__init__()
+        self.engine_path = engine_path
+        self.depth = depth
+        self.threads = threads or BENCH_THREADS
+        self.hash_size = hash_size or BENCH_HASH
+        self.positions = positions if positions else BENCH_POSITIONS
+        self.uci_shell = UciShell()
+
+    def _bench_options(self, engine: UciEngine):
+        """Build the fixed option dict (Threads/Hash only if the engine supports them).
+
+        The .uci file isnt read, its level sections (Skill, UCI_Elo...) would limit the search.
+        """
+        options = {}
+        engine_options = engine.get_options()
+        if 'Threads' in engine_options:
+            options['Threads'] = self.threads
+        if 'Hash' in engine_options:
+            options['Hash'] = self.hash_size
+        return options
+
+    def run_engine(self, eng: dict):
+        """Benchmark a single engine (dict from read_engine_ini) and return the result dict."""
+        result = {'file': eng['file'], 'name': eng['name'], 'threads': self.threads, 'hash': self.hash_size,
+                  'depth': self.depth, 'startup': None, 'rss': 0, 'nps': 0, 'nodes': 0, 'time_to_depth': None,
+                  'positions': [], 'error': ''}
+        start = time.time()
+        engine = UciEngine(file=eng['file'], uci_shell=self.uci_shell)
+        try:
+            engine.get_name()
+        except AttributeError:
+            result['error'] = 'engine not started'
+            return result
+        try:
+            engine.options = self._bench_options(engine)  # not startup(): no .uci levels, no tuner limits
+            engine.send()
+            engine.engine.isready()
+            result['startup'] = time.time() - start
+
+            handler = BenchHandler()
+            engine.engine.info_handlers.append(handler)
+            for fen in self.positions:
+                game = chess.Board(fen)
+                engine.newgame(game)
+                engine.engine.isready()
+                go_time = time.time()
+                engine.go({'depth': self.depth}).result()
+                used_time = time.time() - go_time
+                nps = handler.max_nps if handler.max_nps else int(handler.max_nodes / max(used_time, 0.001))
+                result['positions'].append({'fen': fen, 'time': used_time, 'nodes': handler.max_nodes, 'nps': nps})
+            result['rss'] = read_rss(engine.engine.process.pid())
+        except chess.uci.EngineTerminatedException:
+            logging.exception('engine terminated during benchmark')
+            result['error'] = 'engine terminated'
+        finally:
+            engine.quit()
+
+        if result['positions']:
+            total_time = sum([pos['time'] for pos in result['positions']])
+            result['nodes'] = sum([pos['nodes'] for pos in result['positions']])
+            result['time_to_depth'] = total_time
+            result['nps'] = int(result['nodes'] / max(total_time, 0.001))
+        return result
+
+    def run(self, engine_filter=None):
+        """Benchmark all installed engines (optional filtered by a part of the file name)."""
+        results = []
+        for eng in read_engine_ini(engine_path=self.engine_path):
+            if not is_benchmark_engine(eng):
+                continue
+            if engine_filter and engine_filter not in eng['file']:
+                continue
+            logging.info('benchmark engine [%s]', eng['file'])
+            results.append(self.run_engine(eng))
+        return results
+
+
+def write_report(results: list, filename: str):
+    """Write the machine readable (json) benchmark report."""
+    report = {'machine': platform.machine(), 'node': platform.node(), 'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+              'results': results}
+    with open(filename, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+
+
+def format_table(results: list):
+    """Return the benchmark results as text table."""
+    lines = ['{:<24} {:>3} {:>5} {:>8} {:>10} {:>8} {:>8}'.format('engine', 'thr', 'hash', 'startup', 'nps',
+                                                                    'ttd', 'rss(MB)')]
+    for res in results:
+        if res['error']:
+            lines.append('{:<24} {}'.format(res['name'][:24], res['error']))
+            continue
+        lines.append('{:<24} {:>3} {:>5} {:>7.2f}s {:>10} {:>7.2f}s {:>8.1f}'.format(
+            res['name'][:24], res['threads'], res['hash'], res['startup'], res['nps'],
+            res['time_to_depth'], res['rss'] / 1024))
+    return '\n'.join(lines)
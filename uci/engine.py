@@ -17,17 +17,29 @@
 
 import logging
 import os
+import time
+import threading
 import configparser
 import spur
 import paramiko
 
 from subprocess import DEVNULL
-from dgt.api import Event
-from utilities import Observable
+from dgt.api import Event, Message
+from utilities import Observable, DisplayMsg
 import chess.uci
+import chess
 from chess import Board
 from uci.informer import Informer
 from uci.read import read_engine_ini
+from uci.tuner import engine_tuner, ENGINE_WEIGHT
+from uci.ponder import ponder_stats, PONDER_OFF, PONDER_SHORT, PONDER_SHORT_SECS
+from uci.prelaunch import prelauncher
+
+
+SSH_KEEPALIVE = 30  # secs
+RESTART_MAX = 3  # restarts within RESTART_WINDOW before the engine is given up
+RESTART_WINDOW = 120  # secs
+RESTART_BACKOFF = 1.0  # secs before the first restart, doubled for each further one
 
 
 class UciShell(object):
@@ -58,6 +70,36 @@ class UciShell(object):
     def get(self):
         return self.shell
 
+    def _transport(self):
+        """Return the paramiko transport of an (already) connected ssh shell or None."""
+        client = getattr(self.shell, '_client', None)
+        return client.get_transport() if client else None
+
+    def connect(self):
+        """Open the ssh connection (again) and keep it alive."""
+        if not self.shell:
+            return False
+        transport = self._transport()
+        if transport and not transport.is_active():
+            self.shell._client.close()
+            self.shell._client = None  # let spur build up a new connection
+        try:
+            self.shell._get_ssh_transport().set_keepalive(SSH_KEEPALIVE)
+            return True
+        except Exception:  # spur raises its own connection errors
+            logging.exception('ssh connection failed')
+            return False
+
+    def is_alive(self):
+        """Check the ssh connection without network traffic (keepalive detects broken connections)."""
+        transport = self._transport()
+        return bool(transport and transport.is_active())
+
+    def close(self):
+        """Close the ssh connection."""
+        if self.shell:
+            self.shell.close()
+
 
 class UciEngine(object):
 
@@ -71,24 +113,28 @@ class UciEngine(object):
             if home:
                 # file = home + os.sep + file # wd
                 pass   # wd 
-            if self.shell:
-                self.engine = chess.uci.spur_spawn_engine(self.shell, [file])
-            else:
-                self.engine = chess.uci.popen_engine(file, stderr=DEVNULL)
-
             self.file = file
-            if self.engine:
-                handler = Informer()
-                self.engine.info_handlers.append(handler)
-                self.engine.uci()
-            else:
-                logging.error('engine executable [%s] not found', file)
+            self.quitting = False
+            self.crash_log = []
+            self.restart_lock = threading.Lock()
+            self.search_lock = threading.RLock()  # go/stop/ponderhit also come from the ponder timer thread
+            self.generation = 0  # increased with every engine restart
+            self.last_game = None
+            self.pending_go = None  # (go function, time_dict, start time) of a not yet finished search
+            self.engine = self._spawn()
             self.options = {}
             self.future = None
             self.show_best = True
+            self.bestmove_time = None
+            self.ponder_key = None  # (engine name, time control) of the current ponder move guess
+            self.ponder_start = None
+            self.ponder_end = None
+            self.ponder_timer = None
 
             self.res = None
             self.level_support = False
+            self.level_options = {}
+            self.tune_pending = False
             # self.installed_engines = read_engine_ini(self.shell, (file.rsplit(os.sep, 1))[0]) # wd
             # self.installed_engines2 = read_engine_ini()engine_shell=self.shell, engine_path=(file.rsplit(os.sep, 1))[0], filename='favorites.ini') ## favorites # wd
 
@@ -100,6 +146,105 @@ class UciEngine(object):
         except TypeError:
             logging.exception('engine executable not found')
 
+    def _spawn(self):
+        """Start the engine process and let a watchdog wait for its ending."""
+        prelaunched = prelauncher.take(self.file) if self.shell is None else None
+        if prelaunched:  # already started (and uci initialized) in the background
+            engine = prelaunched
+        elif hasattr(self.shell, 'spawn_engine'):  # uci over tcp
+            engine = self.shell.spawn_engine(self.file)
+        elif self.shell:
+            engine = chess.uci.spur_spawn_engine(self.shell, [self.file])
+        else:
+            engine = chess.uci.popen_engine(self.file, stderr=DEVNULL)
+        if engine:
+            handler = Informer()
+            engine.info_handlers.append(handler)
+            if not prelaunched:
+                engine.uci()
+            watchdog = threading.Thread(target=self._watchdog, args=(engine,), name='engine watchdog')
+            watchdog.daemon = True
+            watchdog.start()
+        else:
+            logging.error('engine executable [%s] not found', self.file)
+        return engine
+
+    def _watchdog(self, engine):
+        """Wait (without polling) for the end of the engine process and restart it in case of a crash."""
+        try:
+            return_code = engine.process.wait_for_return_code()
+        except Exception:  # the shell connection can break as well
+            logging.exception('engine watchdog failed')
+            return_code = None
+        if self.quitting or engine is not self.engine:
+            return
+        logging.error('engine [%s] terminated unexpected with code: %s', self.file, return_code)
+        recent = [crash for crash in self.crash_log if time.time() - crash['time'] < RESTART_WINDOW]
+        if len(recent) >= RESTART_MAX:
+            logging.error('engine [%s] crashed %s times in %ssecs => not restarted', self.file, len(recent) + 1,
+                          RESTART_WINDOW)
+            self.crash_log.append({'time': time.time(), 'file': self.file, 'return_code': return_code,
+                                   'restart': None, 'reissued': None})
+            self.pending_go = None
+            DisplayMsg.show(Message.ENGINE_FAIL())
+            return
+        backoff = RESTART_BACKOFF * 2 ** len(recent)
+        logging.warning('restart engine [%s] in %.1fsecs', self.file, backoff)
+        time.sleep(backoff)  # an engine crashing on the position shouldnt be restarted in a tight loop
+        self._restart(engine, return_code)
+
+    def _restart(self, dead_engine, return_code):
+        """Restart a crashed engine with the same options, position and pending search."""
+        with self.restart_lock, self.search_lock:  # the main thread must not use the engine while it's swapped
+            if self.quitting or dead_engine is not self.engine:
+                return  # already restarted
+            crash = {'time': time.time(), 'file': self.file, 'return_code': return_code, 'restart': None,
+                     'reissued': None}
+            self.crash_log.append(crash)
+            self.generation += 1
+            try:
+                self.engine = self._spawn()
+                if self.options:
+                    self.engine.setoption(self.options)
+                self.engine.ucinewgame()
+                if self.last_game:
+                    self.engine.position(self.last_game)
+                self.engine.isready()
+            except (OSError, chess.uci.EngineTerminatedException):
+                logging.exception('engine restart failed')
+                return
+            crash['restart'] = time.time() - crash['time']
+            logging.warning('engine [%s] restarted in %.2fsecs', self.file, crash['restart'])
+
+            if self.pending_go:
+                go_func, time_dict, start_time = self.pending_go
+                time_dict = self._remaining_time(time_dict, time.time() - start_time)
+                logging.warning('reissue pending search [%s] with: %s', go_func.__name__, time_dict)
+                crash['reissued'] = go_func.__name__
+                if time_dict is None:
+                    go_func()
+                else:
+                    go_func(time_dict)
+
+    def _remaining_time(self, time_dict, used_time: float):
+        """Subtract the time used before the crash from the clock time of the side to move."""
+        if time_dict is None:
+            return None
+        time_dict = dict(time_dict)
+        time_dict.pop('async_callback', None)
+        time_dict.pop('ponder', None)
+        keys = ['movetime']
+        if self.last_game:
+            keys.append('wtime' if self.last_game.turn == chess.WHITE else 'btime')
+        for key in keys:
+            if key in time_dict:
+                time_dict[key] = str(max(100, int(time_dict[key]) - int(used_time * 1000)))
+        return time_dict
+
+    def get_crash_log(self):
+        """Get the list of engine crashes (and restart timings)."""
+        return self.crash_log
+
     def get_name(self):
         """Get engine name."""
         return self.engine.name
@@ -149,6 +294,28 @@ class UciEngine(object):
         """Return ponder support."""
         return 'Ponder' in self.engine.options
 
+    def set_move_overhead(self, overhead: int):
+        """Set the measured move overhead (ms), never below the engine default - return False if the engine has no such option."""
+        if 'Move Overhead' not in self.engine.options:
+            return False
+        option = self.engine.options['Move Overhead']
+        try:
+            overhead = max(overhead, int(self.level_options.get('Move Overhead', 0)))
+        except ValueError:
+            pass
+        if option.default is not None:
+            overhead = max(int(option.default), overhead)
+        if option.max is not None:
+            overhead = min(option.max, overhead)
+        if self.options.get('Move Overhead') != overhead:
+            self.options['Move Overhead'] = overhead
+            self.engine.setoption({'Move Overhead': overhead})
+        return True
+
+    def get_bestmove_time(self):
+        """Return the time the engine sent its last bestmove."""
+        return self.bestmove_time
+
     def get_file(self):
         """Get File."""
         return self.file
@@ -163,14 +330,49 @@ class UciEngine(object):
 
     def position(self, game: Board):
         """Set position."""
-        self.engine.position(game)
+        if self.tune_pending and self.is_waiting():
+            self._apply_tuning()
+        self.last_game = game.copy()
+        with self.search_lock:
+            try:
+                self.engine.position(game)
+            except chess.uci.EngineTerminatedException:
+                logging.error('Engine terminated')  # the watchdog restarts the engine with the last position
+
+    def is_local(self):
+        """Return if the engine runs on this machine."""
+        return self.shell is None
+
+    def rebalance(self):
+        """Tuner callback: Threads/Hash allocation changed (send now or before the next search)."""
+        self.tune_pending = True
+        if self.is_waiting():
+            self._apply_tuning()
+
+    def _apply_tuning(self):
+        """Send the new Threads/Hash allocation to the engine."""
+        self.tune_pending = False
+        tuned = engine_tuner.tune('engine', self.engine.options, self.level_options, weight=ENGINE_WEIGHT)
+        changed = {}
+        for name in ('Threads', 'Hash'):
+            if name in tuned and str(tuned[name]) != str(self.options.get(name)):  # .uci values are strings
+                changed[name] = tuned[name]
+        if changed:
+            logging.debug('tuner: new engine allocation %s', changed)
+            self.options.update(changed)
+            self.engine.setoption(changed)
 
     def quit(self):
         """Quit engine."""
-        if self.engine.quit():  # Ask nicely
-            if self.engine.terminate():  # If you won't go nicely....
-                if self.engine.kill():  # Right that does it!
-                    return False
+        engine_tuner.unregister('engine', self.rebalance)
+        self.quitting = True
+        try:
+            if self.engine.quit():  # Ask nicely
+                if self.engine.terminate():  # If you won't go nicely....
+                    if self.engine.kill():  # Right that does it!
+                        return False
+        except chess.uci.EngineTerminatedException:
+            logging.info('engine already terminated')
         return True
 
     def uci(self):
@@ -181,14 +383,17 @@ class UciEngine(object):
         """Stop engine."""
         logging.info('show_best old: %s new: %s', self.show_best, show_best)
         self.show_best = show_best
-        if self.is_waiting():
-            logging.info('engine already stopped')
+        with self.search_lock:
+            if self.is_waiting():
+                logging.info('engine already stopped')
+                return self.res
+            self.pending_go = None
+            try:
+                self.engine.stop()
+                return self.future.result()
+            except chess.uci.EngineTerminatedException:
+                logging.error('Engine terminated')  # the watchdog restarts the engine
             return self.res
-        try:
-            self.engine.stop()
-        except chess.uci.EngineTerminatedException:
-            logging.error('Engine terminated')  # @todo find out, why this can happen!
-        return self.future.result()
 
     def pause_pgn_audio(self):  ##molli v3
         """Stop engine."""
@@ -200,48 +405,121 @@ class UciEngine(object):
 
     def go(self, time_dict: dict):
         """Go engine."""
-        self.show_best = True
-        time_dict['async_callback'] = self.callback
-        logging.debug('molli: timedict: %s', str(time_dict))
-        # Observable.fire(Event.START_SEARCH())
-        self.future = self.engine.go(**time_dict)
-        return self.future
+        self._cancel_ponder_timer()
+        with self.search_lock:
+            self.show_best = True
+            self.pending_go = (self.go, dict(time_dict), time.time())
+            time_dict['async_callback'] = self._guarded(self.callback)
+            logging.debug('molli: timedict: %s', str(time_dict))
+            # Observable.fire(Event.START_SEARCH())
+            self._go(**time_dict)
+            return self.future
     
     def go_emu(self):
         """Go engine."""
         logging.debug('molli: go_emu')
-        self.future = self.engine.go(async_callback=self.callback)
+        with self.search_lock:
+            self.pending_go = (self.go_emu, None, time.time())
+            self._go(async_callback=self._guarded(self.callback))
 
     def ponder(self):
         """Ponder engine."""
-        self.show_best = False
-
-        # Observable.fire(Event.START_SEARCH())
-        self.future = self.engine.go(ponder=True, infinite=True, async_callback=self.callback)
-        return self.future
-
-    def brain(self, time_dict: dict):
-        """Permanent brain."""
-        self.show_best = True
-        time_dict['ponder'] = True
-        time_dict['async_callback'] = self.callback3
-
-        # Observable.fire(Event.START_SEARCH())
-        self.future = self.engine.go(**time_dict)
-        return self.future
+        with self.search_lock:
+            self.show_best = False
+            self.pending_go = (self.ponder, None, time.time())
+
+            # Observable.fire(Event.START_SEARCH())
+            self._go(ponder=True, infinite=True, async_callback=self._guarded(self.callback))
+            return self.future
+
+    def brain(self, time_dict: dict, time_control=''):
+        """Permanent brain - depending on the ponder hit rate shortened or not started at all."""
+        self._cancel_ponder_timer()
+        self.ponder_key = (self.get_name(), time_control)
+        self.ponder_start = self.ponder_end = None
+        mode = ponder_stats.mode(self.ponder_key)
+        if mode == PONDER_OFF:
+            logging.info('permanent brain not started cause of a poor ponder hit rate')
+            return None
+        with self.search_lock:
+            self.show_best = True
+            self.pending_go = (self.brain, dict(time_dict), time.time())
+            time_dict['ponder'] = True
+            time_dict['async_callback'] = self._guarded(self.callback3)
+
+            # Observable.fire(Event.START_SEARCH())
+            self._go(**time_dict)
+            self.ponder_start = time.time()
+            if mode == PONDER_SHORT:
+                self.ponder_timer = threading.Timer(PONDER_SHORT_SECS, self._cut_ponder, [self.future])
+                self.ponder_timer.start()
+            return self.future
+
+    def _cut_ponder(self, future):
+        """Stop a (still running) shortened ponder search - runs in the timer thread."""
+        with self.search_lock:  # the main thread might start a new search or send a ponderhit meanwhile
+            if future is self.future and self.is_pondering():
+                logging.info('permanent brain shortened cause of a poor ponder hit rate')
+                self.ponder_end = time.time()
+                self.stop()
+
+    def _cancel_ponder_timer(self):
+        if self.ponder_timer:
+            self.ponder_timer.cancel()
+            self.ponder_timer = None
+
+    def ponder_result(self, hit: bool):
+        """Record if the user played the pondering move (also if the engine wasnt pondering)."""
+        self._cancel_ponder_timer()
+        if self.ponder_key is None:
+            return
+        ponder_secs = 0
+        if self.ponder_start:
+            ponder_secs = (self.ponder_end or time.time()) - self.ponder_start
+        try:
+            threads = int(self.options.get('Threads', 1))
+        except ValueError:
+            threads = 1
+        ponder_stats.add(self.ponder_key, hit, ponder_secs, threads)
+        self.ponder_key = self.ponder_start = self.ponder_end = None
 
     def hit(self):
         """Send a ponder hit."""
         logging.info('show_best: %s', self.show_best)
-        self.engine.ponderhit()
-        self.show_best = True
+        with self.search_lock:
+            try:
+                self.engine.ponderhit()
+            except chess.uci.EngineTerminatedException:
+                logging.error('Engine terminated')  # the watchdog restarts the engine & search
+            self.show_best = True
+
+    def _go(self, **kwargs):
+        """Start a search (needs the search lock) - on a dead engine the watchdog reissues the pending one."""
+        try:
+            self.future = self.engine.go(**kwargs)
+        except chess.uci.EngineTerminatedException:
+            logging.error('Engine terminated')  # the watchdog restarts the engine & search
+        return self.future
+
+    def _guarded(self, callback):
+        """Wrap the callback, so that results of a search started before an engine restart are ignored."""
+        generation = self.generation
+
+        def guarded_callback(command):
+            if generation != self.generation:
+                logging.info('ignore result of a search from the crashed engine')
+                return
+            callback(command)
+        return guarded_callback
 
     def callback(self, command):
         """Callback function."""
         try:
             self.res = command.result()
+            self.bestmove_time = time.time()
+            self.pending_go = None
         except chess.uci.EngineTerminatedException:
-            logging.error('Engine terminated')  # @todo find out, why this can happen!
+            logging.error('Engine terminated')  # the watchdog restarts the engine & search
             self.show_best = False
         logging.info('res: %s', self.res)
         # Observable.fire(Event.STOP_SEARCH())
@@ -254,8 +532,10 @@ class UciEngine(object):
         """Callback function."""
         try:
             self.res = command.result()
+            self.bestmove_time = time.time()
+            self.pending_go = None
         except chess.uci.EngineTerminatedException:
-            logging.error('Engine terminated')  # @todo find out, why this can happen!
+            logging.error('Engine terminated')  # the watchdog restarts the engine & search
             self.show_best = False
         logging.info('res: %s', self.res)
         # Observable.fire(Event.STOP_SEARCH())
@@ -304,6 +584,12 @@ class UciEngine(object):
                 options = dict(parser[parser.sections().pop()])
 
         self.level_support = bool(options)
+        self.level_options = dict(options)
+
+        if self.is_local():  # share the cores & memory with the other (tutor) engines
+            engine_tuner.register('engine', weight=ENGINE_WEIGHT, callback=self.rebalance)
+            options = engine_tuner.tune('engine', self.engine.options, options, weight=ENGINE_WEIGHT)
+            self.tune_pending = False
 
         logging.debug('setting engine with options %s', options)
         self.options = options
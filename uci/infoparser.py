@@ -0,0 +1,227 @@
+# Copyright (C) 2013-2018 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+from collections.abc import Sequence
+
+import chess
+import chess.uci
+from chess.uci import Score
+
+# all uci info keywords - needed to find the end of the variable length parameters (pv, refutation, currline)
+INFO_KEYWORDS = {'depth', 'seldepth', 'time', 'nodes', 'pv', 'multipv', 'score', 'currmove', 'currmovenumber',
+                 'hashfull', 'nps', 'tbhits', 'sbhits', 'cpuload', 'refutation', 'currline', 'ebf', 'string', 'wdl'}
+INT_FIELDS = {'depth', 'seldepth', 'time', 'nodes', 'hashfull', 'nps', 'tbhits', 'cpuload'}
+DEFAULT_FIELDS = ('multipv', 'score', 'pv', 'depth')
+
+
+class LazyPv(Sequence):
+
+    """Principal variation which converts the uci move strings into (legal checked) moves only when used."""
+
+    __slots__ = ('board', 'tokens', 'moves', 'valid_board')
+
+    def __init__(self, board: chess.Board, tokens: list):
+        self.board = board  # the engine replaces (never changes) its board => no copy needed
+        self.tokens = tokens
+        self.moves = []
+        self.valid_board = None
+
+    def _parse(self, count=None):
+        """Convert the next tokens up to count (all if None) - stops at the first illegal move like chess.uci."""
+        if len(self.moves) >= len(self.tokens) or (count is not None and count <= len(self.moves)):
+            return
+        if self.valid_board is None:
+            self.valid_board = self.board.copy(stack=False)
+        end = len(self.tokens) if count is None else min(count, len(self.tokens))
+        while len(self.moves) < end:
+            token = self.tokens[len(self.moves)]
+            try:
+                self.moves.append(self.valid_board.push_uci(token))
+            except ValueError:
+                logging.debug('illegal pv move [%s] in %s', token, self.tokens)
+                self.tokens = self.tokens[:len(self.moves)]
+                break
+        if len(self.moves) == len(self.tokens):
+            self.valid_board = None
+            self.board = None
+
+    def first(self):
+        """Return the first move without checking the others."""
+        self._parse(1)
+        return self.moves[0] if self.moves else None
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) or index < 0:
+            self._parse()
+        else:
+            self._parse(index + 1)
+        return self.moves[index]
+
+    def __len__(self):
+        self._parse()
+        return len(self.moves)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return 'LazyPv({})'.format(' '.join(self.tokens))
+
+
+class InfoParser(object):
+
+    """Field selective uci info parser - parameters not registered are skipped without any conversion."""
+
+    def __init__(self, fields=DEFAULT_FIELDS):
+        super(InfoParser, self).__init__()
+        self.fields = set(fields)
+
+    def parse(self, arg, board: chess.Board):
+        """Parse the arguments of an info line (bytes or str) into a dict of the registered fields."""
+        if isinstance(arg, bytes):
+            arg = arg.decode('utf-8', 'replace')
+        tokens = arg.split()
+        result = {}
+        fields = self.fields
+        index = 0
+        count = len(tokens)
+        while index < count:
+            keyword = tokens[index]
+            index += 1
+            if keyword == 'string':
+                if 'string' in fields:
+                    result['string'] = ' '.join(tokens[index:])
+                break
+            if keyword in ('pv', 'refutation', 'currline'):
+                start = index
+                while index < count and tokens[index] not in INFO_KEYWORDS:
+                    index += 1
+                if keyword == 'pv' and 'pv' in fields:
+                    result['pv'] = tokens[start:index]
+                continue
+            if keyword == 'score':
+                index = self._score(tokens, index, result, 'score' in fields)
+                continue
+            if keyword == 'wdl':
+                index += 3
+                continue
+            if index >= count:
+                break
+            if keyword in fields:
+                try:
+                    if keyword in INT_FIELDS or keyword == 'multipv' or keyword == 'currmovenumber':
+                        result[keyword] = int(tokens[index])
+                    elif keyword == 'ebf':
+                        result[keyword] = float(tokens[index])
+                    else:
+                        result[keyword] = tokens[index]
+                except ValueError:
+                    logging.debug('invalid info value [%s %s]', keyword, tokens[index])
+            index += 1
+        if 'pv' in result:
+            result['pv'] = LazyPv(board, result['pv'])
+        return result
+
+    @staticmethod
+    def _score(tokens, index, result, wanted):
+        """Parse "score cp|mate x [lowerbound|upperbound]" and return the next index."""
+        kind = tokens[index] if index < len(tokens) else None
+        value = tokens[index + 1] if index + 1 < len(tokens) else None
+        index += 2
+        bound = index < len(tokens) and tokens[index] in ('lowerbound', 'upperbound')
+        if bound:
+            index += 1
+        if wanted and not bound and kind in ('cp', 'mate'):  # like chess.uci bounds are ignored
+            try:
+                result['score'] = Score(int(value), None) if kind == 'cp' else Score(None, int(value))
+            except (TypeError, ValueError):
+                logging.debug('invalid info score [%s %s]', kind, value)
+        return index
+
+
+class FastInfoHandler(chess.uci.InfoHandler):
+
+    """Info handler filling the same info dict as chess.uci.InfoHandler, but only with the registered fields."""
+
+    def __init__(self, fields=DEFAULT_FIELDS):
+        super(FastInfoHandler, self).__init__()
+        self.parser = InfoParser(fields)
+
+    def feed(self, arg, board: chess.Board):
+        """Process the arguments of an info line."""
+        self.pre_info(arg)
+        try:
+            values = self.parser.parse(arg, board)
+            multipv = values.get('multipv', 1)
+            if 'pv' in values:
+                self.info['pv'][multipv] = values.pop('pv')
+            if 'score' in values:
+                self.info['score'][multipv] = values.pop('score')
+            self.info.update(values)
+        finally:
+            self.post_info()
+
+
+class FastInfoEngine(chess.uci.Engine):
+
+    """Engine passing the info lines to FastInfoHandlers without the full chess.uci parsing."""
+
+    def _info(self, arg):
+        handlers = list(self.info_handlers)
+        if handlers and all(isinstance(handler, FastInfoHandler) for handler in handlers):
+            for handler in handlers:
+                handler.feed(arg, self.board)
+        else:  # other handlers need the full parser (it also feeds the fast ones the standard way)
+            super(FastInfoEngine, self)._info(arg)
+
+
+class ShallowSnapshotHandler(FastInfoHandler):
+
+    """FastInfoHandler also keeping the lines of a shallow pass, so one engine gives the shallow and deep results."""
+
+    def __init__(self, fields=DEFAULT_FIELDS):
+        super(ShallowSnapshotHandler, self).__init__(fields)
+        self.shallow = {'pv': {}, 'score': {}, 'depth': 0}
+        self.shallow_pass = False
+
+    def begin_shallow(self):
+        """The lines of the next search(es) replace the shallow ones - till end_shallow()."""
+        with self.lock:
+            self.shallow = {'pv': {}, 'score': {}, 'depth': 0}
+            self.shallow_pass = True
+
+    def end_shallow(self):
+        with self.lock:
+            self.shallow_pass = False
+
+    def feed(self, arg, board: chess.Board):
+        self.pre_info(arg)
+        try:
+            values = self.parser.parse(arg, board)
+            multipv = values.get('multipv', 1)
+            if self.shallow_pass and 'pv' in values and 'score' in values:
+                self.shallow['pv'][multipv] = values['pv']
+                self.shallow['score'][multipv] = values['score']
+                self.shallow['depth'] = values.get('depth') or self.shallow['depth']
+            if 'pv' in values:
+                self.info['pv'][multipv] = values.pop('pv')
+            if 'score' in values:
+                self.info['score'][multipv] = values.pop('score')
+            self.info.update(values)
+        finally:
+            self.post_info()
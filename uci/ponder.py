@@ -0,0 +1,86 @@
+# Copyright (C) 2013-2018 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import threading
+from collections import deque
+
+PONDER_ON = 'on'
+PONDER_SHORT = 'short'
+PONDER_OFF = 'off'
+
+PONDER_WINDOW = 20  # the policy looks at the last ponder results only
+PONDER_MIN_SAMPLES = 8  # always ponder until this many results are known
+PONDER_RATE_OFF = 0.2  # hit rate below => dont ponder at all
+PONDER_RATE_SHORT = 0.4  # hit rate below => stop pondering after PONDER_SHORT_SECS
+PONDER_SHORT_SECS = 10
+
+
+class PonderStats(object):
+
+    """Ponder hits/misses, time saved by hits and cpu time spent on misses (by engine and time control)."""
+
+    def __init__(self):
+        super(PonderStats, self).__init__()
+        self.stats = {}  # (engine name, time control) => dict
+        self.lock = threading.Lock()
+
+    def add(self, key: tuple, hit: bool, ponder_secs: float, threads=1):
+        """Add the result of a ponder move guess. ponder_secs is 0 if the engine wasnt pondering."""
+        with self.lock:
+            stat = self.stats.setdefault(key, {'hits': 0, 'misses': 0, 'saved_secs': 0.0, 'wasted_cpu_secs': 0.0,
+                                               'recent': deque(maxlen=PONDER_WINDOW)})
+            stat['recent'].append(hit)
+            if hit:
+                stat['hits'] += 1
+                stat['saved_secs'] += ponder_secs
+            else:
+                stat['misses'] += 1
+                stat['wasted_cpu_secs'] += ponder_secs * threads
+        logging.debug('ponder %s [%s] %.1fsecs', 'hit' if hit else 'miss', key, ponder_secs)
+
+    def recent_rate(self, key: tuple):
+        """Return the hit rate of the last results (None if not enough known)."""
+        with self.lock:
+            recent = list(self.stats[key]['recent']) if key in self.stats else []
+        if len(recent) < PONDER_MIN_SAMPLES:
+            return None
+        return sum(recent) / len(recent)
+
+    def mode(self, key: tuple):
+        """Return the ponder mode (on, short or off) the hit rate deserves."""
+        rate = self.recent_rate(key)
+        if rate is None or rate >= PONDER_RATE_SHORT:
+            return PONDER_ON
+        return PONDER_SHORT if rate >= PONDER_RATE_OFF else PONDER_OFF
+
+    def report(self):
+        """Return the stats as a list (for the web info page)."""
+        result = []
+        with self.lock:
+            items = list(self.stats.items())
+        for (engine_name, time_control), stat in items:
+            total = stat['hits'] + stat['misses']
+            result.append({'engine': engine_name, 'time_control': time_control, 'hits': stat['hits'],
+                           'misses': stat['misses'], 'hit_rate': round(stat['hits'] / total, 2) if total else 0,
+                           'saved_per_hit': round(stat['saved_secs'] / stat['hits'], 1) if stat['hits'] else 0,
+                           'wasted_cpu_secs': round(stat['wasted_cpu_secs'], 1),
+                           'mode': self.mode((engine_name, time_control))})
+        return result
+
+
+ponder_stats = PonderStats()
@@ -0,0 +1,153 @@
+# Copyright (C) 2013-2018 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import threading
+from subprocess import DEVNULL
+
+import chess.uci
+
+PRELAUNCH_DELAY = 3  # secs an engine must stay selected in the menu before it gets started
+PRELAUNCH_WAIT = 60  # max secs to wait for a still starting engine when it is chosen
+PRELAUNCH_EXPIRE = 180  # secs an unused prelaunched engine is kept running
+
+
+def is_emulation_name(name: str):
+    """Return if the engine name marks a mame/mess emulated engine (case insensitive)."""
+    name = str(name).lower()
+    return '(mame' in name or '(mess' in name
+
+
+def is_emulation_engine(eng: dict):
+    """Return if the engine (from engines.ini) is a mame/mess emulated one with a slow startup."""
+    return is_emulation_name(eng.get('name', ''))
+
+
+class EnginePrelauncher(object):
+
+    """Start a slow (mame/mess) engine in the background and hand over the ready process once it is chosen."""
+
+    def __init__(self):
+        super(EnginePrelauncher, self).__init__()
+        self.file = None
+        self.engine = None
+        self.ready = threading.Event()
+        self.delay_timer = None
+        self.expire_timer = None
+        self.lock = threading.Lock()
+
+    def request(self, file: str, delay=PRELAUNCH_DELAY):
+        """Prelaunch the engine if it is still wanted after delay secs (a previous request is discarded).
+
+        A file None only discards the previous request.
+        """
+        with self.lock:
+            if self.delay_timer:
+                self.delay_timer.cancel()
+                self.delay_timer = None
+            if file is None or file == self.file:
+                return
+            self.delay_timer = threading.Timer(delay, self._launch, [file])
+            self.delay_timer.start()
+
+    def _launch(self, file: str):
+        with self.lock:
+            self.delay_timer = None
+            old_engine = self._discard()
+            self.file = file
+        self._quit(old_engine)
+
+        logging.info('prelaunch engine [%s]', file)
+        try:
+            engine = chess.uci.popen_engine(file, stderr=DEVNULL)
+            engine.uci()  # the engine answers "uciok" & "readyok" only after its (emulation) setup
+            engine.isready()
+        except (OSError, chess.uci.EngineTerminatedException):
+            logging.exception('prelaunch of [%s] failed', file)
+            engine = None
+        with self.lock:
+            wanted = self.file == file
+            if wanted:
+                self.engine = engine
+                self.ready.set()
+                self.expire_timer = threading.Timer(PRELAUNCH_EXPIRE, self.cancel)
+                self.expire_timer.start()
+        if not wanted:
+            self._quit(engine)
+            return
+        logging.info('prelaunched engine [%s] ready', file)
+
+    def take(self, file: str, timeout=PRELAUNCH_WAIT):
+        """Return the ready engine process for file (or None) - also waits for a still starting engine."""
+        with self.lock:
+            if self.delay_timer:
+                self.delay_timer.cancel()
+                self.delay_timer = None
+            if file != self.file:
+                return None
+        if not self.ready.wait(timeout):
+            logging.warning('prelaunched engine [%s] not ready in time', file)
+            self.cancel()
+            return None
+        with self.lock:
+            if file != self.file:
+                return None
+            engine = self.engine
+            self.engine = None
+            self.file = None
+            self.ready.clear()
+            if self.expire_timer:
+                self.expire_timer.cancel()
+                self.expire_timer = None
+        if engine is None or not engine.is_alive():
+            return None
+        logging.info('use prelaunched engine [%s]', file)
+        return engine
+
+    def _discard(self):
+        """Forget the prelaunched engine and return it (needs the lock)."""
+        engine = self.engine
+        self.engine = None
+        self.file = None
+        self.ready.clear()
+        if self.expire_timer:
+            self.expire_timer.cancel()
+            self.expire_timer = None
+        return engine
+
+    @staticmethod
+    def _quit(engine):
+        if engine is None:
+            return
+        try:
+            engine.quit()
+        except chess.uci.EngineTerminatedException:
+            pass
+
+    def cancel(self):
+        """Stop a pending or prelaunched engine."""
+        with self.lock:
+            if self.delay_timer:
+                self.delay_timer.cancel()
+                self.delay_timer = None
+            engine = self._discard()
+        if engine:
+            logging.info('quit unused prelaunched engine')
+        self._quit(engine)
+
+
+prelauncher = EnginePrelauncher()
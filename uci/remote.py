@@ -0,0 +1,331 @@
+# Copyright (C) 2013-2018 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import hmac
+import io
+import logging
+import ipaddress
+import os
+import socket
+import socketserver
+import subprocess
+import threading
+import time
+
+import chess.uci
+from uci.engine import UciShell
+
+TCP_PORT = 9999
+TCP_HOST = '127.0.0.1'  # the tcp server listens only locally unless bound elsewhere with a key
+TCP_TIMEOUT = 5
+HEALTH_INTERVAL = 60  # secs a successful network check of a tcp server is trusted
+
+
+class TcpProcess(object):
+
+    """Process replacement (for chess.uci.Engine) talking to an engine served over tcp."""
+
+    def __init__(self, engine, sock: socket.socket):
+        self.engine = engine
+        self.sock = sock
+        self.sock.settimeout(None)
+        self.reader = sock.makefile('r', encoding='utf-8', newline='\n')
+        self.alive = True
+        self.send_lock = threading.Lock()
+        self.terminated = threading.Event()
+
+        self.engine.on_process_spawned(self)
+        self._receiving_thread = threading.Thread(target=self._receiving_thread_target, name='tcp engine reader')
+        self._receiving_thread.daemon = True
+        self._receiving_thread.start()
+
+    def _receiving_thread_target(self):
+        try:
+            for line in self.reader:
+                self.engine.on_line_received(line.rstrip('\r\n'))
+        except OSError:
+            pass
+        self.alive = False
+        self._close()
+        self.terminated.set()
+        self.engine.on_terminated()
+
+    def _close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def is_alive(self):
+        return self.alive
+
+    def terminate(self):
+        self.alive = False
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def kill(self):
+        self.terminate()
+
+    def send_line(self, string):
+        with self.send_lock:
+            self.sock.sendall((string + '\n').encode('utf-8'))
+
+    def wait_for_return_code(self):
+        self.terminated.wait()
+        return 0
+
+    def pid(self):
+        return None
+
+
+def sign(key: str, nonce: str):
+    """Return the answer to the challenge nonce of a server with the shared key."""
+    return hmac.new(key.encode('utf-8'), nonce.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def _read_line(sock: socket.socket):
+    """Read one line byte by byte - nothing after it is taken from the socket."""
+    data = b''
+    while not data.endswith(b'\n'):
+        char = sock.recv(1)
+        if not char:
+            break
+        data += char
+    return data.decode('utf-8', errors='replace').strip()
+
+
+def is_local_address(host: str):
+    """Return if the listen address is a loopback one."""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class TcpShell(object):
+
+    """Shell replacement for engines served by a UciTcpServer (uci over tcp instead of ssh)."""
+
+    def __init__(self, hostname, port=TCP_PORT, timeout=TCP_TIMEOUT, key=''):
+        super(TcpShell, self).__init__()
+        self.hostname = hostname
+        self.port = port
+        self.timeout = timeout
+        self.key = key
+        self.last_check = 0
+
+    def get(self):
+        return self
+
+    def _request(self, request: str):
+        sock = socket.create_connection((self.hostname, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        greeting = _read_line(sock)  # "hello" or "challenge <nonce>" of a server with a key
+        command, _, nonce = greeting.partition(' ')
+        if command == 'challenge':
+            sock.sendall('auth {}\n'.format(sign(self.key, nonce)).encode('utf-8'))
+        elif command != 'hello':
+            sock.close()
+            raise ConnectionError('no uci tcp server: {}'.format(greeting))
+        sock.sendall((request + '\n').encode('utf-8'))
+        return sock
+
+    def is_alive(self):
+        """Check the server (only if the last successful check is older than HEALTH_INTERVAL)."""
+        if time.time() - self.last_check < HEALTH_INTERVAL:
+            return True
+        try:
+            with self._request('ping') as sock:
+                alive = sock.makefile('r').readline().strip() == 'pong'
+        except OSError:
+            alive = False
+        self.last_check = time.time() if alive else 0
+        return alive
+
+    def open(self, name, mode='r'):
+        """Read a (text) file like the engine uci file from the server."""
+        try:
+            with self._request('file ' + name) as sock:
+                reader = sock.makefile('r', encoding='utf-8')
+                status = reader.readline().strip()
+                content = reader.read()
+        except OSError as os_exc:
+            raise FileNotFoundError(name) from os_exc
+        if status != 'ok':
+            raise FileNotFoundError(name)
+        return io.StringIO(content)
+
+    def spawn_engine(self, file: str):
+        """Start the engine on the server and return a connected chess.uci engine."""
+        sock = self._request('engine ' + file)
+        engine = chess.uci.Engine()
+        TcpProcess(engine, sock)
+        return engine
+
+
+class RemoteShellPool(object):
+
+    """Keep the connections to remote engine servers open and check them lazily."""
+
+    def __init__(self):
+        super(RemoteShellPool, self).__init__()
+        self.shells = {}
+        self.lock = threading.Lock()
+
+    def get(self, hostname, username=None, key_file=None, password=None, windows=False):
+        """Return a working ssh shell for the server or None."""
+        key = ('ssh', hostname, username, key_file, password, windows)
+        with self.lock:
+            shell = self.shells.get(key)
+            if shell is None:
+                shell = UciShell(hostname=hostname, username=username, key_file=key_file, password=password,
+                                 windows=windows)
+                self.shells[key] = shell
+            if shell.is_alive():
+                return shell
+            start = time.time()
+            if shell.connect():
+                logging.debug('connected to [%s] in %.2fsecs', hostname, time.time() - start)
+                return shell
+        return None
+
+    def get_tcp(self, hostname, port=TCP_PORT, server_key=''):
+        """Return a working uci over tcp shell for the server or None."""
+        key = ('tcp', hostname, port, server_key)
+        with self.lock:
+            shell = self.shells.get(key)
+            if shell is None:
+                shell = TcpShell(hostname, port, key=server_key)
+                self.shells[key] = shell
+            return shell if shell.is_alive() else None
+
+    def close(self):
+        """Close all connections."""
+        with self.lock:
+            for shell in self.shells.values():
+                if isinstance(shell, UciShell):
+                    shell.close()
+            self.shells = {}
+
+
+remote_pool = RemoteShellPool()
+
+
+class UciTcpHandler(socketserver.StreamRequestHandler):
+
+    """Serve one client request: ping, file <name> or engine <file>."""
+
+    def _engine_file(self, name: str):
+        """Return the real path of name if it is inside the engine folder (or None)."""
+        path = os.path.realpath(name if os.path.isabs(name) else os.path.join(self.server.engine_home, name))
+        if os.path.commonpath([path, self.server.engine_home]) != self.server.engine_home:
+            logging.warning('tcp server: access outside of engine folder [%s]', name)
+            return None
+        return path
+
+    def _authorized(self):
+        """Greet the client - a server with a key lets it answer a challenge first."""
+        if not self.server.key:
+            self.wfile.write(b'hello\n')
+            return True
+        nonce = os.urandom(16).hex()
+        self.wfile.write('challenge {}\n'.format(nonce).encode('utf-8'))
+        command, _, answer = self.rfile.readline(256).decode('utf-8', errors='replace').strip().partition(' ')
+        if command == 'auth' and hmac.compare_digest(answer, sign(self.server.key, nonce)):
+            return True
+        logging.warning('tcp server: wrong key from %s', self.client_address)
+        return False
+
+    def handle(self):
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if not self._authorized():
+            return
+        request = self.rfile.readline().decode('utf-8').strip()
+        command, _, name = request.partition(' ')
+        if command == 'ping':
+            self.wfile.write(b'pong\n')
+        elif command == 'file':
+            path = self._engine_file(name)
+            try:
+                with open(path, 'rb') as file:
+                    self.wfile.write(b'ok\n' + file.read())
+            except (OSError, TypeError):
+                self.wfile.write(b'error\n')
+        elif command == 'engine':
+            path = self._engine_file(name)
+            if path and os.access(path, os.X_OK):
+                self._pipe_engine(path)
+        else:
+            logging.warning('tcp server: unknown request [%s]', request)
+
+    def _pipe_engine(self, path: str):
+        """Connect the socket with the stdin/stdout of a new engine process."""
+        logging.info('tcp server: start engine [%s] for %s', path, self.client_address)
+        process = subprocess.Popen([path], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL, cwd=os.path.dirname(path), bufsize=0)
+
+        def engine_to_client():
+            for line in iter(process.stdout.readline, b''):
+                try:
+                    self.wfile.write(line)
+                except OSError:
+                    break
+            try:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        output = threading.Thread(target=engine_to_client)
+        output.daemon = True
+        output.start()
+        try:
+            for line in self.rfile:
+                process.stdin.write(line)
+                process.stdin.flush()
+        except OSError:
+            pass
+        if process.poll() is None:
+            try:
+                process.stdin.write(b'quit\n')
+                process.stdin.flush()
+                process.wait(timeout=2)
+            except (OSError, subprocess.TimeoutExpired):
+                process.kill()
+        output.join(timeout=2)
+
+
+class UciTcpServer(socketserver.ThreadingTCPServer):
+
+    """Native uci over tcp engine server - a lightweight alternative to ssh."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, engine_home: str, host=TCP_HOST, port=TCP_PORT, key=''):
+        """Serve the engines of engine_home - a non local host needs a shared key (ValueError otherwise)."""
+        if not key and not is_local_address(host):
+            raise ValueError('a uci tcp server listening on [{}] needs a key'.format(host))
+        self.engine_home = os.path.realpath(engine_home)
+        self.key = key
+        super(UciTcpServer, self).__init__((host, port), UciTcpHandler)
@@ -0,0 +1,136 @@
+# Copyright (C) 2013-2018 Jean-Francois Romang (jromang@posteo.de)
+#                         Shivkumar Shivaji ()
+#                         Jürgen Précour (LocutusOfPenguin@posteo.de)
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import os
+from threading import Lock
+
+HASH_MEMORY_SHARE = 0.25  # max part of the available memory used for all engine hash tables together
+HASH_MIN = 1
+HASH_MAX = 1024
+ENGINE_WEIGHT = 2  # the playing engine gets a bigger part than a single tutor engine
+TUTOR_WEIGHT = 1
+
+
+def available_memory():
+    """Return the available memory in MB (0 if unknown)."""
+    try:
+        with open('/proc/meminfo', 'r') as meminfo:
+            values = {}
+            for line in meminfo:
+                parts = line.split()
+                if len(parts) >= 2:
+                    values[parts[0].rstrip(':')] = int(parts[1])
+        return int(values.get('MemAvailable', values.get('MemFree', 0)) / 1024)
+    except (OSError, ValueError):
+        return 0
+
+
+def _power_of_two(value: int):
+    """Round value down to the next power of two (engines like these hash sizes best)."""
+    power = 1
+    while power * 2 <= value:
+        power *= 2
+    return power
+
+
+class EngineTuner(object):
+
+    """Divide Threads/Hash between all engines running at the same time on this machine."""
+
+    def __init__(self, cores=None, memory=None):
+        super(EngineTuner, self).__init__()
+        self.cores = cores if cores else (os.cpu_count() or 1)
+        self.memory = memory  # None => read the available memory each time
+        self.consumers = {}  # name => (weight, callback)
+        self.lock = Lock()
+
+    def register(self, name: str, weight=1, callback=None):
+        """Register an engine and rebalance the others."""
+        with self.lock:
+            self.consumers[name] = (weight, callback)
+        logging.debug('tuner: registered [%s] consumers: %s', name, list(self.consumers))
+        self.rebalance(name)
+
+    def unregister(self, name: str, callback=None):
+        """Unregister an engine (only if the callback is still the registered one) and rebalance the others."""
+        with self.lock:
+            if name not in self.consumers:
+                return
+            if callback is not None and self.consumers[name][1] != callback:
+                return  # already replaced by a newer engine
+            del self.consumers[name]
+        logging.debug('tuner: unregistered [%s] consumers: %s', name, list(self.consumers))
+        self.rebalance(name)
+
+    def is_registered(self, name: str):
+        """Return if the engine name is registered."""
+        return name in self.consumers
+
+    def allocation(self, name: str, weight=1):
+        """Return the (threads, hash) for the engine name - also for a not (yet) registered one."""
+        with self.lock:
+            consumers = dict(self.consumers)
+        if name in consumers:
+            weight = consumers[name][0]
+        else:
+            consumers[name] = (weight, None)
+        total_weight = sum([cons[0] for cons in consumers.values()])
+
+        threads = max(1, int(self.cores * weight / total_weight))
+        memory = self.memory if self.memory is not None else available_memory()
+        if memory:
+            hash_size = int(memory * HASH_MEMORY_SHARE * weight / total_weight)
+            hash_size = min(HASH_MAX, max(HASH_MIN, _power_of_two(hash_size)))
+        else:
+            hash_size = None
+        return threads, hash_size
+
+    def tune(self, name: str, engine_options: dict, options: dict, weight=1, max_threads=None):
+        """Return a copy of the options with Threads/Hash fitted to the engine allocation.
+
+        Values from the uci file are taken as an upper limit, missing values are added.
+        """
+        threads, hash_size = self.allocation(name, weight)
+        if max_threads:
+            threads = min(threads, max_threads)
+        tuned = dict(options)
+        for opt_name, value in (('Threads', threads), ('Hash', hash_size)):
+            if value is None or opt_name not in engine_options:
+                continue
+            option = engine_options[opt_name]
+            try:
+                if opt_name in tuned and int(tuned[opt_name]) <= value:
+                    continue
+            except ValueError:
+                pass
+            if option.min is not None:
+                value = max(option.min, value)
+            if option.max is not None:
+                value = min(option.max, value)
+            tuned[opt_name] = value
+        return tuned
+
+    def rebalance(self, initiator=None):
+        """Inform all other engines about a changed allocation."""
+        with self.lock:
+            callbacks = [cons[1] for name, cons in self.consumers.items() if name != initiator and cons[1]]
+        for callback in callbacks:
+            callback()
+
+
+engine_tuner = EngineTuner()
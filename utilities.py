@@ -25,10 +25,15 @@ import json
 import time
 import copy
 import configparser
+import random
+import collections
+import atexit
 
-from threading import Timer
+from threading import Timer, Lock, Thread, Event
 from subprocess import Popen, PIPE
 
+import chess.polyglot
+
 from dgt.translate import DgtTranslate
 from dgt.api import Dgt
 ## molli: for switching off the DGT clock display
@@ -165,6 +170,156 @@ def get_opening_books():
     return library
 
 
+class BookReader(chess.polyglot.MemoryMappedReader):
+
+    """Memory mapped polyglot book (binary search on the mapped file) with a one pass weighted choice."""
+
+    def weighted_choice(self, board, exclude_moves=(), random=random):
+        """Select an entry distributed by weight - the position is hashed & searched only once."""
+        entries = list(self.find_all(board, exclude_moves=exclude_moves))
+        total_weights = sum(entry.weight for entry in entries)
+        if not total_weights:
+            raise IndexError()
+
+        choice = random.randint(0, total_weights - 1)
+        current_sum = 0
+        for entry in entries:
+            current_sum += entry.weight
+            if current_sum > choice:
+                return entry
+
+
+class BookStore(object):
+
+    """Keep all opening books open (memory mapped) - switching the book costs nothing."""
+
+    def __init__(self):
+        super(BookStore, self).__init__()
+        self.readers = {}
+        self.lock = Lock()
+
+    def get(self, file: str):
+        """Return the (cached) reader for the book file."""
+        with self.lock:
+            reader = self.readers.get(file)
+            if reader is None:
+                reader = BookReader(file)
+                self.readers[file] = reader
+        return reader
+
+    def open_all(self, books: list):
+        """Open all books of the library (see get_opening_books)."""
+        for book in books:
+            try:
+                self.get(book['file'])
+            except OSError:
+                logging.debug('opening book [%s] not found', book['file'])
+
+    def close(self):
+        """Close all books."""
+        with self.lock:
+            for reader in self.readers.values():
+                reader.close()
+            self.readers = {}
+
+
+book_store = BookStore()
+
+
+class LogSink(object):
+
+    """Write log files (picotutor-log.txt etc) in the background - a log call only puts the line into a ring buffer.
+
+    The lines are formatted (msg % args) by the flush thread, so only pass args not changed after the call.
+    If the buffer overflows the oldest lines are dropped (and the count of them written instead).
+    """
+
+    OFF = 0
+    NORMAL = 1
+    VERBOSE = 2
+
+    def __init__(self, capacity=4096, interval=1.0, level=NORMAL):
+        super(LogSink, self).__init__()
+        self.level = level
+        self.interval = interval
+        self.buffer = collections.deque(maxlen=capacity)
+        self.dropped = 0
+        self.files = {}  # file name => open file (truncated on the first write)
+        self.lock = Lock()
+        self.flush_lock = Lock()  # the flush thread and flush() shouldnt write at the same time
+        self.wakeup = Event()
+        self.thread = None
+
+    def enabled(self, level=NORMAL):
+        """Return if lines of level get logged - check it before building expensive args."""
+        return 0 < level <= self.level
+
+    def set_level(self, level: int):
+        """Switch the verbosity at runtime (OFF, NORMAL or VERBOSE) - also safe in a signal handler."""
+        self.level = level
+
+    def write(self, file_name: str, level: int, msg: str, *args):
+        """Log the line to file_name (if level is enabled)."""
+        if not 0 < level <= self.level:
+            return
+        with self.lock:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+            self.buffer.append((file_name, msg, args))
+            if self.thread is None:
+                self.thread = Thread(target=self._run, name='log_sink', daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            self._flush()
+
+    def _flush(self):
+        with self.flush_lock:
+            with self.lock:
+                lines = list(self.buffer)
+                self.buffer.clear()
+                dropped = self.dropped
+                self.dropped = 0
+            if lines:
+                self._write_lines(lines, dropped)
+
+    def _write_lines(self, lines: list, dropped: int):
+        used = set()
+        for file_name, msg, args in lines:
+            log_file = self._file(file_name)
+            if log_file is None:
+                continue
+            if dropped and not used:
+                log_file.write('... {} lines dropped\n'.format(dropped))
+            try:
+                log_file.write((msg % args if args else msg) + '\n')
+            except (TypeError, ValueError) as exc:
+                log_file.write('log format error {}: {}\n'.format(exc, msg))
+            used.add(log_file)
+        for log_file in used:
+            log_file.flush()
+
+    def _file(self, file_name: str):
+        if file_name not in self.files:
+            try:
+                self.files[file_name] = open(file_name, 'w')
+            except OSError:
+                logging.warning('could not create log file [%s]', file_name)
+                self.files[file_name] = None
+        return self.files[file_name]
+
+    def flush(self):
+        """Write the buffered lines now (e.g. before shutdown)."""
+        self._flush()
+
+
+log_sink = LogSink(level=LogSink.OFF)  # switched on by picochess (--tutor-log)
+
+
 def hms_time(seconds: int):
     """Transfer a seconds integer to hours,mins,secs."""
     if seconds < 0:
@@ -1679,6 +1679,23 @@ function setHeaders(data) {
     writeVariationTree(pgnEl, exporter.toString(), gameHistory);
 }
 
+function setPonderStats(stats) {
+    var body = $('#PonderTable tbody');
+    body.empty();
+    $.each(stats || [], function(index, stat) {
+        var row = $('<tr>');
+        row.append($('<td>').text(stat.engine));
+        row.append($('<td>').text(stat.time_control));
+        row.append($('<td>').text(stat.hits));
+        row.append($('<td>').text(stat.misses));
+        row.append($('<td>').text(Math.round(stat.hit_rate * 100) + '%'));
+        row.append($('<td>').text(stat.saved_per_hit + 's'));
+        row.append($('<td>').text(stat.wasted_cpu_secs + 's'));
+        row.append($('<td>').text(stat.mode));
+        body.append(row);
+    });
+}
+
 function getAllInfo() {
     $.get('/info', {action: 'get_system_info'}, function(data) {
         window.system_info = data;
@@ -1701,6 +1718,16 @@ function getAllInfo() {
         console.warn(textStatus);
         dgtClockStatusEl.html(textStatus);
     });
+    getPonderStats();
+}
+
+function getPonderStats() {
+    $.get('/info', {action: 'get_ponder_stats'}, function(data) {
+        window.ponder_stats = data.ponder_stats;
+        setPonderStats(data.ponder_stats);
+    }).fail(function(jqXHR, textStatus) {
+        console.warn(textStatus);
+    });
 }
 
 $('#flipOrientationBtn').on('click', boardFlip);
@@ -1714,6 +1741,7 @@ $('#downloadBtn').on('click', download);
 $('#broadcastBtn').on('click', broadcastPosition);
 
 $('#analyzeBtn').on('click', analyzePressed);
+$('a[href="#ponder"]').on('shown.bs.tab', getPonderStats);
 
 $('#analyzePlus').on('click', multiPvIncrease);
 $('#analyzeMinus').on('click', multiPvDecrease);